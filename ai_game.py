@@ -3,96 +3,846 @@ This file contains the AIGame class which adds methods for makeing computer
 moves for singleplayer chess games
 """
 import chess
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+import copy
+import cProfile
+from evaluation import Evaluator
 from game import Game
-import mysql.connector
+import itertools
+import multiprocessing
+from move_ordering import MoveOrderer, tactical_moves
+from opening_book import OpeningBook, get_book
+from search_cache import SearchCache, get_cache
+from search_stats import Iteration, SearchStats
+import threading
+import time
+from transposition import (EXACT, LOWER, UPPER, SharedTranspositionTable, 
+                           TranspositionTable, position_key)
+
+
+# Search Values
+MATE_SCORE = 100000
+INFINITY = 1000000
+MAX_DEPTH = 64
+OPENING_MOVES = 10      # Moves played from the openings book
+CHECK_INTERVAL = 1024   # Nodes searched between time budget checks
+QUIESCENCE_NODES = 1000 # Quiescence nodes allowed below each leaf
+DELTA_MARGIN = 200      # Centipawns a capture may gain beyond its victim
+CACHE_PLIES = 2         # Plies from the root using the search cache
+CACHE_MIN_DEPTH = 3     # Least depth of results kept in the search cache
+PONDER_LIMIT = 3        # Time budgets a ponder search may take at most
+STOP_POLL = 0.05        # Seconds between stop checks while awaiting workers
+STOP_SLOTS = 64         # Searches the workers' stop flags tell apart
+
+# Worker processes are spawned rather than forked.  A fork from the search
+# thread while another thread holds a lock, such as the stdin lock of the 
+# UCI loop, leaves the lock held in the worker forever.
+WORKER_CONTEXT = multiprocessing.get_context("spawn")
+
+# Result of an iterative deepening search
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'depth', 'nodes', 
+                                           'qnodes', 'time', 
+                                           'cpu_utilization'])
+
+
+# Background search of an AI move and the user move it expects, if pondering
+Thinker = namedtuple('Thinker', ['searcher', 'thread', 'predicted'])
+
+
+class SearchTimeout(Exception):
+    """ Raised inside the search when the time or node budget runs out """
+
+
+def _usable(entry, depth, alpha, beta):
+    """ Returns whether a stored result can be used in place of searching
+    :param tuple entry: The stored (key, depth, score, bound, move, ...)
+    :param int depth: Depth the position is to be searched to
+    :param int alpha: Min value for alpha pruning
+    :param int beta: Max value for beta pruning
+    :return: True if the result was searched deep enough and its bound is
+        outside the window or exact
+    :rtype: bool
+    """
+    _, entry_depth, score, bound, move = entry[:5]
+    return entry_depth >= depth and move is not None and (
+        bound == EXACT or (bound == LOWER and score >= beta) or 
+        (bound == UPPER and score <= alpha))
+
+
+# Search game of each worker process of a parallel search
+_worker_game = None
+
+# Identifies each search to the stop flags of the worker processes
+_search_ids = itertools.count(1)
+
+def _init_worker(tt_name, tt_size_mb, stop_flags):
+    """ Sets up a worker process of a parallel search with its own game 
+    attached to the shared transposition table
+    :param str tt_name: Name of the shared memory of the table
+    :param int tt_size_mb: Memory cap of the table in megabytes
+    :param multiprocessing.Array stop_flags: Id of the last stopped search
+        in the slot of each search id modulo STOP_SLOTS
+    """
+    global _worker_game
+    _worker_game = AIGame(opening_book=False)
+    _worker_game.tt = SharedTranspositionTable(tt_size_mb, tt_name)
+    _worker_game._stop_flags = stop_flags
+
+
+def _search_root_move(board, move, depth, alpha, beta, generation, deadline,
+                      search_id):
+    """ Searches one root move in a worker process
+    :param chess.Board board: The root position
+    :param chess.Move move: The root move to search
+    :param int depth: Depth of the search from the root
+    :param int alpha: Min value for alpha pruning
+    :param int beta: Max value for beta pruning
+    :param int generation: Transposition table generation of the search
+    :param float or None deadline: Wall clock time the search must stop at
+    :param int search_id: Id of the search, checked against the stop flags
+    :return: The score of the move or None if the search ran out of time,
+        the main search and quiescence nodes searched and the CPU time taken
+    :rtype: tuple(int or None, int, int, float)
+    """
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    game = _worker_game
+    game.board = board
+    game.evaluator.reset(board)
+    game.tt.generation = generation
+    game._search_id = search_id
+    game.nodes = 0
+    game.qnodes = 0
+    game._deadline = None
+    if deadline is not None:
+        game._deadline = start + deadline - time.time()
+    game._max_nodes = None
+    game._next_check = CHECK_INTERVAL
+    game._can_stop = True
+    try:
+        score = game.search_root_move(move, depth, alpha, beta)
+    except SearchTimeout:
+        score = None
+    return score, game.nodes, game.qnodes, time.process_time() - cpu_start
+
 
 class AIGame(Game):
-    def __init__(self):
+    def __init__(self, tt_size_mb=16, time_limit=2.0, node_limit=None, 
+                 workers=1, opening_book=True, background=False, 
+                 ponder=False, search_cache=False, stats=False, 
+                 on_iteration=None, profile=None):
+        """ Creates the game and the transposition table used by the search
+        :param int tt_size_mb: Memory cap of the transposition table in
+            megabytes
+        :param float or None time_limit: Seconds the AI may think per move
+        :param int or None node_limit: Nodes the AI may search per move
+        :param int workers: Number of processes to search with, the 
+            transposition table is kept in shared memory when more than one
+        :param bool or str or OpeningBook opening_book: True to play the 
+            first moves from the default opening book, the name of a backend
+            from opening_book or a book to play them from, False for no 
+            book.  Named books are shared by every game and only opened on 
+            the first probe.
+        :param bool background: True to think on a background thread, the
+            AI move is then made by update once it is ready
+        :param bool ponder: True to search the expected reply on a 
+            background thread while the user is thinking, for at most 
+            PONDER_LIMIT times the time budget
+        :param bool or str or SearchCache search_cache: True to keep search
+            results near the root in the default on-disk search cache, the
+            name of a cache file or a cache to keep them in, False for none.
+            Caches are shared by every game and process using the file.
+        :param bool stats: True to count and time what each search does in
+            stats, searches without stats run no counting code
+        :param function or None on_iteration: Called with an Iteration 
+            after each completed iteration of a search
+        :param str or None profile: File to dump the cProfile stats of each
+            search to
+        """
         super().__init__()
-        self.db = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            passwd="briansql",
-            database="chess_openings"
-        )
-        self.cursor = self.db.cursor(buffered=True)
+        self.tt_size_mb = tt_size_mb
+        self.workers = workers
+        self._pool = None
+        self._stop_flags = None
+        self._search_id = 0
+        if workers > 1:
+            self.tt = SharedTranspositionTable(tt_size_mb)
+            # Forks share the pool, its processes are started by the first
+            # parallel search
+            self._stop_flags = WORKER_CONTEXT.Array('q', STOP_SLOTS, 
+                                                    lock=False)
+            self._pool = ProcessPoolExecutor(
+                workers, mp_context=WORKER_CONTEXT, initializer=_init_worker,
+                initargs=(self.tt.name, tt_size_mb, self._stop_flags))
+        else:
+            self.tt = TranspositionTable(tt_size_mb)
+        self.orderer = MoveOrderer()
+        self.evaluator = Evaluator(self.board)
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.last_search = None
+        self.nodes = 0
+        self.qnodes = 0
+        self._qnode_cap = 0
+        self._deadline = None
+        self._max_nodes = None
+        self._next_check = CHECK_INTERVAL
+        self._can_stop = False
+        self._busy_time = 0.0
+        self._search_start = time.perf_counter()
+        self._stop_requested = False
+        self._hit_deadline = None
+        self.background = background
+        self.ponder = ponder
+        self.reply = None
+        self._thinker = None
+        self._ponderer = None
+        if isinstance(opening_book, OpeningBook):
+            self.book = opening_book
+        elif opening_book is True:
+            self.book = get_book()
+        elif opening_book:
+            self.book = get_book(opening_book)
+        else:
+            self.book = None
+        if isinstance(search_cache, SearchCache):
+            self.cache = search_cache
+        elif search_cache is True:
+            self.cache = get_cache()
+        elif search_cache:
+            self.cache = get_cache(search_cache)
+        else:
+            self.cache = None
+        self.stats = SearchStats() if stats else None
+        self.on_iteration = on_iteration
+        self.profile = profile
+
+    def close(self):
+        """ Stops any background thinking, shuts down the worker processes 
+        and frees the shared transposition table of a parallel search
+        """
+        self.cancel_thinking()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        if isinstance(self.tt, SharedTranspositionTable):
+            self.tt.close()
+
+    def reset(self):
+        """ Stops any background thinking and resets the game """
+        self.cancel_thinking()
+        super().reset()
+
+    def undo_move(self):
+        """ Stops any background thinking and undoes the last move """
+        self.cancel_thinking()
+        super().undo_move()
+
+    def redo_move(self):
+        """ Stops any background thinking and redoes the last undone move """
+        self.cancel_thinking()
+        super().redo_move()
 
     def user_move(self, move):
-        """ Make the move if it is legal, if move works, make AI move
+        """ Make the move if it is legal, if move works, make AI move.  In 
+        background mode the AI move is only started here and is made by 
+        update once it is ready, if the move was the one pondered on the 
+        ponder search carries on as the AI's search.
         :param chess.Move move: The move to attempt
         """
-        if self.move(move): 
-            if self.is_game_over():
-                return
-            if self.board.fullmove_number < 10:
-                ai_move = self.get_opening_move()
-            else:
-                _, ai_move = self.minimax(4, -1000, 1000, self.board.turn==chess.WHITE)
-            self.move(ai_move)
+        if self.thinking or not self.move(move):
+            return
+        if self.is_game_over():
+            self.cancel_thinking()
+            return
+        if not self.background:
+            self.move(self.get_ai_move())
+            return
+
+        ponderer, self._ponderer = self._ponderer, None
+        if ponderer is not None and ponderer.predicted == move:
+            ponderer.searcher.ponderhit(self.time_limit)
+            self._thinker = ponderer
+        else:
+            if ponderer is not None:
+                ponderer.searcher.stop()
+            self._thinker = self._start_thinking(self.board)
+
+    def get_ai_move(self):
+        """ Get the AI move for the current position, from the openings 
+        database for the first moves and from the search otherwise
+        :return: The move to make
+        :rtype: chess.Move
+        """
+        if self.in_opening():
+            return self.get_opening_move()
+        return self.get_search_move()
+
+    def in_opening(self):
+        """ Returns whether the AI move should come from the openings book 
+        :return: True if there is a book and the game is in its first moves
+        :rtype: bool
+        """
+        return (self.book is not None and 
+                self.board.fullmove_number < OPENING_MOVES)
+
+    @property
+    def thinking(self):
+        """ True while the AI move is being found on a background thread """
+        return self._thinker is not None
+
+    def update(self):
+        """ Makes the AI move once the background thread has found it and 
+        starts pondering on the expected reply
+        :return: True if the board changed
+        :rtype: bool
+        """
+        thinker = self._thinker
+        if thinker is None or thinker.thread.is_alive():
+            return False
+        self._thinker = None
+        self.last_search = thinker.searcher.last_search
+        reply = thinker.searcher.reply
+        if reply is None and not self.is_game_over():
+            # The background search failed, the AI's turn isn't dropped but 
+            # searched for here instead
+            reply = self.get_ai_move()
+        if reply is None or not self.move(reply):
+            return False
+        if self.ponder and not self.is_game_over():
+            entry = self.tt.probe(position_key(self.board))
+            predicted = entry[4] if entry is not None else None
+            if predicted is not None and self.board.is_legal(predicted):
+                board = self.board.copy()
+                board.push(predicted)
+                if board.outcome() is None:
+                    self._ponderer = self._start_thinking(board, predicted)
+        return True
+
+    def cancel_thinking(self):
+        """ Stops and throws away any background search """
+        for thinker in (self._thinker, self._ponderer):
+            if thinker is not None:
+                thinker.searcher.stop()
+                thinker.thread.join()
+        self._thinker = None
+        self._ponderer = None
+
+    def _start_thinking(self, board, predicted=None):
+        """ Starts finding the AI move for the given board on a background
+        thread
+        :param chess.Board board: The position to find the AI move for
+        :param chess.Move or None predicted: The user move expected to lead
+            to the position when pondering, the search then runs until it is 
+            stopped or ponderhit is called
+        :return: The search game, thread and predicted move
+        :rtype: Thinker
+        """
+        searcher = self.fork(board)
+        if predicted is None:
+            target = searcher.think
+        else:
+            target = searcher.think_until_stopped
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        return Thinker(searcher, thread, predicted)
+
+    def fork(self, board):
+        """ Creates a game for a background search of the given board.  It
+        shares the transposition table, move ordering tables, worker 
+        processes and opening book but has its own board.
+        :param chess.Board board: The board to search
+        :return: The search game
+        :rtype: AIGame
+        """
+        searcher = copy.copy(self)
+        searcher.board = board.copy()
+        searcher.captured_value = list(self.captured_value)
+        searcher.undone_moves = deque()
+        searcher._made_values = []
+        searcher.evaluator = Evaluator(searcher.board)
+        searcher._stop_requested = False
+        searcher._hit_deadline = None
+        # A ponderhit before the search starts measures its budget from now
+        searcher._search_start = time.perf_counter()
+        searcher.background = False
+        searcher.reply = None
+        searcher._thinker = None
+        searcher._ponderer = None
+        return searcher
+
+    def think(self):
+        """ Finds the AI move and keeps it in reply """
+        self.reply = self.get_ai_move()
+
+    def think_until_stopped(self):
+        """ Searches until stop, the time budget given by ponderhit or 
+        PONDER_LIMIT time budgets run out and keeps the best move in reply.
+        The cap keeps an idle window from searching for as long as the user
+        thinks.
+        """
+        if self.in_opening():
+            self.reply = self.get_opening_move()
+        else:
+            time_limit = None
+            if self.time_limit:
+                time_limit = self.time_limit * PONDER_LIMIT
+            self.last_search = self.search(time_limit, self.node_limit)
+            self.reply = self.last_search.move
+
+    def stop(self):
+        """ Stops the search running on another thread, and its root moves 
+        running in the worker processes, as soon as possible
+        """
+        self._stop_requested = True
+        self._stop_workers()
+
+    def _stop_workers(self):
+        """ Stops the root moves of this game's search running in the worker
+        processes
+        """
+        if self._stop_flags is not None:
+            self._stop_flags[self._search_id % STOP_SLOTS] = self._search_id
+
+    def ponderhit(self, time_limit):
+        """ Gives a search running on another thread a time budget from 
+        when it started
+        :param float or None time_limit: Seconds the search may take in total
+        """
+        if time_limit:
+            self._hit_deadline = self._search_start + time_limit
+            self._deadline = self._hit_deadline
+
+    def get_search_move(self):
+        """ Search the current position within the AI's time and node budget
+        and keep the search result in last_search
+        :return: The best move found
+        :rtype: chess.Move
+        """
+        self.last_search = self.search(self.time_limit, self.node_limit)
+        return self.last_search.move
+
+    def search(self, time_limit=None, node_limit=None, max_depth=MAX_DEPTH):
+        """ Iteratively deepen minimax searches of depth 1, 2, 3... until the
+        time or node budget runs out.  The first iteration always completes.
+        The search is counted in stats and profiled if they are enabled.
+        :param float or None time_limit: Seconds the search may take
+        :param int or None node_limit: Nodes the search may visit
+        :param int max_depth: Depth to stop deepening at
+        :return: The best move and score of the last completed iteration 
+            along with the depth reached, main search and quiescence nodes
+            searched, time taken and the CPU utilization of the worker 
+            processes, their speedup in time to depth is measured by 
+            selfplay.py --speedup
+        :rtype: SearchResult
+        """
+        if self.stats is None and self.profile is None:
+            return self._deepen(time_limit, node_limit, max_depth)
+
+        profiler = None
+        if self.profile is not None:
+            profiler = cProfile.Profile()
+        if self.stats is not None:
+            self.stats.attach(self)
+        try:
+            if profiler is not None:
+                return profiler.runcall(self._deepen, time_limit, node_limit,
+                                        max_depth)
+            return self._deepen(time_limit, node_limit, max_depth)
+        finally:
+            if self.stats is not None:
+                self.stats.detach(self)
+            if profiler is not None:
+                profiler.dump_stats(self.profile)
+
+    def _deepen(self, time_limit, node_limit, max_depth):
+        """ Runs the iterations of search
+        :param float or None time_limit: Seconds the search may take
+        :param int or None node_limit: Nodes the search may visit
+        :param int max_depth: Depth to stop deepening at
+        :return: The result of the search
+        :rtype: SearchResult
+        """
+        start = time.perf_counter()
+        self._search_start = start
+        self._search_id = next(_search_ids)
+        self.tt.new_search()
+        self.orderer.new_search()
+        self.evaluator.reset(self.board)
+        self.nodes = 0
+        self.qnodes = 0
+        self._deadline = self._hit_deadline
+        if time_limit:
+            self._deadline = start + time_limit
+            # A ponderhit before the search started keeps its budget
+            if self._hit_deadline:
+                self._deadline = min(self._deadline, self._hit_deadline)
+        self._max_nodes = node_limit
+        self._next_check = CHECK_INTERVAL
+        if node_limit and node_limit < CHECK_INTERVAL:
+            self._next_check = node_limit
+        self._can_stop = False
+        self._busy_time = 0.0
+        parallel_time = 0.0
+
+        root_ply = self.board.ply()
+        root_key = position_key(self.board)
+        is_white = self.board.turn == chess.WHITE
+        score, move, reached = 0, None, 0
+        while reached < max_depth:
+            depth = reached + 1
+            try:
+                if self.workers > 1 and depth > 1:
+                    iteration_start = time.perf_counter()
+                    score, move = self._parallel_root(depth, is_white)
+                    parallel_time += time.perf_counter() - iteration_start
+                else:
+                    score, move = self.minimax(depth, -INFINITY, INFINITY, 
+                                               is_white)
+            except SearchTimeout:
+                while self.board.ply() > root_ply:
+                    self.unmake_move()
+                break
+            # A deeper result reused from the table or cache skips the 
+            # iterations up to its depth
+            reached = depth
+            entry = self.tt.probe(root_key)
+            if entry is not None and entry[3] == EXACT and entry[1] > depth:
+                reached = min(entry[1], max_depth)
+            self._can_stop = True
+            if self.stats is not None or self.on_iteration is not None:
+                iteration = Iteration(reached, score, move, self.nodes, 
+                                      self.qnodes, 
+                                      time.perf_counter() - start, 
+                                      self.principal_variation(reached))
+                if self.stats is not None:
+                    self.stats.iteration(iteration)
+                if self.on_iteration is not None:
+                    self.on_iteration(iteration)
+            if abs(score) >= MATE_SCORE:
+                break
+        if self.cache is not None:
+            self.cache.flush()
+        elapsed = time.perf_counter() - start
+        # CPU time of every process over the wall time of the parallel 
+        # iterations
+        cpu_utilization = (self._busy_time / parallel_time if parallel_time 
+                           else 1.0)
+        return SearchResult(move, score, reached, self.nodes, self.qnodes, 
+                            elapsed, cpu_utilization)
+
+    def principal_variation(self, max_length=MAX_DEPTH):
+        """ Follow the best moves stored in the transposition table from the
+        current position
+        :param int max_length: The most moves to follow
+        :return: The expected line of play
+        :rtype: list[chess.Move]
+        """
+        board = self.board.copy(stack=False)
+        pv = []
+        seen = set()
+        while len(pv) < max_length:
+            key = position_key(board)
+            entry = self.tt.probe(key)
+            if entry is None or key in seen or entry[4] is None or (
+                not board.is_legal(entry[4])):
+                break
+            seen.add(key)
+            pv.append(entry[4])
+            board.push(entry[4])
+        return pv
+
+    def _parallel_root(self, depth, is_white):
+        """ Search the root position with the worker processes.  The first
+        root move is searched here with the full window and the rest are 
+        searched by the workers with the window narrowed by its score.  The 
+        workers share the transposition table so each prunes with the others'
+        results.
+        :param int depth: Depth to search moves to
+        :param bool is_white: True when it's white's turn to move
+        :return: Maximum evaluation and the best move to make
+        :rtype: tuple(int, chess.Move)
+        """
+        key = position_key(self.board)
+        entry = self.tt.probe(key)
+        hash_move = entry[4] if entry is not None else None
+        moves = list(self.orderer.moves(self.board, hash_move, 0))
+
+        cpu_start = time.process_time()
+        best_move = moves[0]
+        best_eval = self.search_root_move(best_move, depth, -INFINITY, 
+                                          INFINITY)
+        self._busy_time += time.process_time() - cpu_start
+        if is_white: alpha, beta = best_eval, INFINITY
+        else: alpha, beta = -INFINITY, best_eval
+
+        deadline = None
+        if self._deadline:
+            deadline = time.time() + self._deadline - time.perf_counter()
+        futures = [self._pool.submit(_search_root_move, self.board, move, 
+                                     depth, alpha, beta, self.tt.generation,
+                                     deadline, self._search_id)
+                   for move in moves[1:]]
+        try:
+            for move, future in zip(moves[1:], futures):
+                cur_eval, nodes, qnodes, busy = self._wait(future)
+                self.nodes += nodes
+                self.qnodes += qnodes
+                self._busy_time += busy
+                if cur_eval is None:
+                    raise SearchTimeout()
+                if ((is_white and cur_eval > best_eval) or 
+                    (not is_white and cur_eval < best_eval)):
+                    best_eval = cur_eval
+                    best_move = move
+        except SearchTimeout:
+            self._stop_workers()
+            for pending in futures:
+                pending.cancel()
+            raise
+        self.tt.store(key, depth, best_eval, EXACT, best_move)
+        return best_eval, best_move
+
+    def _wait(self, future):
+        """ Waits for a root move searched by a worker process, checking 
+        whether the search has to stop while waiting
+        :param concurrent.futures.Future future: The search of the move
+        :return: The result of _search_root_move
+        :rtype: tuple(int or None, int, int, float)
+        """
+        while True:
+            try:
+                return future.result(timeout=STOP_POLL)
+            except FutureTimeout:
+                self._check_limits()
+
+    def search_root_move(self, move, depth, alpha, beta):
+        """ Search the position after a root move 
+        :param chess.Move move: The legal root move to search
+        :param int depth: Depth of the search from the root
+        :param int alpha: Min value for alpha pruning
+        :param int beta: Max value for beta pruning
+        :return: The evaluation of the move
+        :rtype: int
+        """
+        is_white = self.board.turn != chess.WHITE
+        self.make_move(move)
+        cur_eval, _ = self.minimax(depth - 1, alpha, beta, is_white, 1)
+        self.unmake_move()
+        return cur_eval
+
+    def _check_limits(self):
+        """ Raise SearchTimeout if the search has run out of time or nodes.  
+        Quiescence nodes count towards the node budget.
+        """
+        nodes = self.nodes + self.qnodes
+        self._next_check = nodes + CHECK_INTERVAL
+        if self._max_nodes and self._next_check > self._max_nodes:
+            self._next_check = self._max_nodes
+        if self._stop_requested:
+            raise SearchTimeout()
+        if (self._stop_flags is not None and 
+            self._stop_flags[self._search_id % STOP_SLOTS] == self._search_id):
+            raise SearchTimeout()
+        if not self._can_stop:
+            return
+        if self._max_nodes and nodes >= self._max_nodes:
+            raise SearchTimeout()
+        if self._deadline and time.perf_counter() >= self._deadline:
+            raise SearchTimeout()
+
+    def make_move(self, move):
+        """ Make a move known to be legal and update the evaluation 
+        :param chess.Move move: The legal move to make
+        """
+        self.evaluator.push(self.board, move)
+        super().make_move(move)
+
+    def unmake_move(self):
+        """ Take back the last move made with make_move """
+        super().unmake_move()
+        self.evaluator.pop()
 
-    def minimax(self, depth, alpha, beta, is_white):
+    def minimax(self, depth, alpha, beta, is_white, ply=0):
         """ Recursively find and return the best move for the turn color 
-        given position and depth using minimax with alpha beta pruning.  The 
-        evaluation is just the value of white captured pieces minus the value 
-        of black captured pieces.
+        given position and depth using minimax with alpha beta pruning.  
+        Positions are scored by the evaluator, which is kept up to date by
+        make_move and unmake_move.  Results are stored in the transposition
+        table and reused when the same position is reached again.  Moves are
+        tried in the order given by the move orderer.
         :param int depth: Depth to searth moves to
         :param int alpha: Min value for alpha pruning
         :param int beta: Max value for beta pruning
         :param bool is_white: True when it's white's turn to move
+        :param int ply: Distance from the root of the search
         :return: Maximum evaluation and the best move to make
         :rtype: tuple(int, chess.Move)
         """
+        self.nodes += 1
+        if self.nodes + self.qnodes >= self._next_check:
+            self._check_limits()
+
         if depth == 0:
-            return self.captured_value[1] - self.captured_value[0], None
-        elif self.is_game_over():
-            if is_white: return -1000, None
-            else: return 1000, None
+            self._qnode_cap = self.qnodes + QUIESCENCE_NODES
+            return self.quiesce(alpha, beta, is_white), None
+        outcome = self.board.outcome()
+        if outcome:
+            if outcome.winner is None: return 0, None
+            elif outcome.winner: return MATE_SCORE, None
+            else: return -MATE_SCORE, None
+
+        key = position_key(self.board)
+        entry = self.tt.probe(key)
+        hash_move = None
+        if entry is not None:
+            hash_move = entry[4]
+            if _usable(entry, depth, alpha, beta):
+                return entry[2], hash_move
+
+        # Results of earlier games and other processes near the root
+        use_cache = (self.cache is not None and ply <= CACHE_PLIES and 
+                     depth >= CACHE_MIN_DEPTH)
+        if use_cache and (entry is None or entry[1] < depth):
+            cached = self.cache.probe(key)
+            if cached is not None:
+                _, cached_depth, score, bound, cached_move = cached
+                if _usable(cached, depth, alpha, beta):
+                    self.tt.store(key, cached_depth, score, bound, 
+                                  cached_move)
+                    return score, cached_move
+                if hash_move is None:
+                    hash_move = cached_move
 
+        alpha_orig, beta_orig = alpha, beta
         if is_white:
-            max_eval = -10000
+            max_eval = -INFINITY
             max_move = None
-            for move in self.board.legal_moves:
-                self.move(move)
-                cur_eval, _ = self.minimax(depth - 1, alpha, beta, False)
-                self.undo_move()
+            for move in self.orderer.moves(self.board, hash_move, ply):
+                self.make_move(move)
+                cur_eval, _ = self.minimax(depth - 1, alpha, beta, False, 
+                                           ply + 1)
+                self.unmake_move()
                 if cur_eval > max_eval:
                     max_eval = cur_eval
                     max_move = move
-                    alpha = cur_eval
+                    if cur_eval > alpha:
+                        alpha = cur_eval
                 if beta <= alpha:
+                    self.orderer.cutoff(self.board, move, depth, ply)
                     break
+            self._store(key, depth, max_eval, max_move, alpha_orig, beta_orig,
+                        use_cache)
             return max_eval, max_move
 
         else:
-            min_eval = 10000
+            min_eval = INFINITY
             min_move = None
-            for move in self.board.legal_moves:
-                self.move(move)
-                cur_eval, _ = self.minimax(depth - 1, alpha, beta, True)
-                self.undo_move()
+            for move in self.orderer.moves(self.board, hash_move, ply):
+                self.make_move(move)
+                cur_eval, _ = self.minimax(depth - 1, alpha, beta, True, 
+                                           ply + 1)
+                self.unmake_move()
                 if cur_eval < min_eval:
                     min_eval = cur_eval
                     min_move = move
-                    beta = cur_eval
+                    if cur_eval < beta:
+                        beta = cur_eval
                 if beta <= alpha:
+                    self.orderer.cutoff(self.board, move, depth, ply)
                     break
+            self._store(key, depth, min_eval, min_move, alpha_orig, beta_orig,
+                        use_cache)
             return min_eval, min_move
 
+    def quiesce(self, alpha, beta, is_white):
+        """ Search only captures and promotions until the position is quiet
+        so the horizon of minimax isn't in the middle of an exchange.  The 
+        side to move may stand pat on the static evaluation, and captures 
+        that can't raise the score to alpha (or lower it to beta for black) 
+        even with a margin are skipped.  Each leaf may only search 
+        QUIESCENCE_NODES nodes.
+        :param int alpha: Min value for alpha pruning
+        :param int beta: Max value for beta pruning
+        :param bool is_white: True when it's white's turn to move
+        :return: The evaluation of the position
+        :rtype: int
+        """
+        self.qnodes += 1
+        if self.nodes + self.qnodes >= self._next_check:
+            self._check_limits()
+
+        stand_pat = self.evaluator.evaluate(self.board)
+        if self.qnodes >= self._qnode_cap:
+            return stand_pat
+
+        if is_white:
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            best = stand_pat
+            for gain, move in tactical_moves(self.board):
+                if stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
+                self.make_move(move)
+                cur_eval = self.quiesce(alpha, beta, False)
+                self.unmake_move()
+                if cur_eval > best:
+                    best = cur_eval
+                    if cur_eval > alpha:
+                        alpha = cur_eval
+                if beta <= alpha:
+                    break
+            return best
+
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            if stand_pat < beta:
+                beta = stand_pat
+            best = stand_pat
+            for gain, move in tactical_moves(self.board):
+                if stand_pat - gain - DELTA_MARGIN >= beta:
+                    continue
+                self.make_move(move)
+                cur_eval = self.quiesce(alpha, beta, True)
+                self.unmake_move()
+                if cur_eval < best:
+                    best = cur_eval
+                    if cur_eval < beta:
+                        beta = cur_eval
+                if beta <= alpha:
+                    break
+            return best
+
+    def _store(self, key, depth, score, move, alpha, beta, cache=False):
+        """ Stores a search result in the transposition table, and the search
+        cache if asked, with the bound type given by the search window it was
+        found with
+        :param int key: The Zobrist hash of the position
+        :param int depth: Depth the position was searched to
+        :param int score: The evaluation of the position
+        :param chess.Move move: The best move found
+        :param int alpha: The alpha value the position was searched with
+        :param int beta: The beta value the position was searched with
+        :param bool cache: True to also store the result in the search cache
+        """
+        if score <= alpha: bound = UPPER
+        elif score >= beta: bound = LOWER
+        else: bound = EXACT
+        self.tt.store(key, depth, score, bound, move)
+        if cache:
+            self.cache.store(key, depth, score, bound, move)
+
     def get_opening_move(self):
         """ Get the most played move for a given position from the opening 
-        database 
-        """
-        selection_call = f"SELECT name, COUNT(name) AS `value_occurrence` \
-                           FROM chess_openings.moves \
-                           WHERE fen = '{self.board.board_fen()}' \
-                           GROUP BY name \
-                           ORDER BY `value_occurrence` DESC \
-                           LIMIT 1;"
-        self.cursor.execute(selection_call)
-        selection = self.cursor.fetchall()
-        if selection:
-            move_uci = selection[0][0]
-            return chess.Move.from_uci(move_uci)
-        else:
-            _, ai_move = self.minimax(4, -1000, 1000, self.board.turn==chess.WHITE)
-            return ai_move
+        book.  The search is used for positions not in the book.
+        :return: The move to make
+        :rtype: chess.Move
+        """
+        move = self.book.probe(self.board)
+        if move is None or not self.board.is_legal(move):
+            return self.get_search_move()
+        return move
@@ -0,0 +1,313 @@
+""" File: evaluation.py
+This file contains the Evaluator class which scores positions for the search
+using tapered middlegame/endgame piece-square tables, mobility and king
+safety.  Scores are in centipawns from white's point of view.
+"""
+import chess
+
+
+# Piece values indexed by piece type
+MG_VALUES = [0, 82, 337, 365, 477, 1025, 0]
+EG_VALUES = [0, 94, 281, 297, 512, 936, 0]
+
+# Game phase weight of each piece type, 24 with every piece on the board
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+# Centipawns for each square a piece attacks that isn't its own piece
+MOBILITY_WEIGHTS = [0, 0, 4, 3, 2, 1, 0]
+
+# Middlegame centipawns for each pawn in front of the king
+SHIELD_BONUS = 12
+
+# Piece-square tables from white's point of view, a8 first and h1 last
+MG_PST = [
+    None,
+    # Pawn
+    [  0,   0,   0,   0,   0,   0,   0,   0,
+      98, 134,  61,  95,  68, 126,  34, -11,
+      -6,   7,  26,  31,  65,  56,  25, -20,
+     -14,  13,   6,  21,  23,  12,  17, -23,
+     -27,  -2,  -5,  12,  17,   6,  10, -25,
+     -26,  -4,  -4, -10,   3,   3,  33, -12,
+     -35,  -1, -20, -23, -15,  24,  38, -22,
+       0,   0,   0,   0,   0,   0,   0,   0],
+    # Knight
+    [-167, -89, -34, -49,  61, -97, -15, -107,
+      -73, -41,  72,  36,  23,  62,   7,  -17,
+      -47,  60,  37,  65,  84, 129,  73,   44,
+       -9,  17,  19,  53,  37,  69,  18,   22,
+      -13,   4,  16,  13,  28,  19,  21,   -8,
+      -23,  -9,  12,  10,  19,  17,  25,  -16,
+      -29, -53, -12,  -3,  -1,  18, -14,  -19,
+     -105, -21, -58, -33, -17, -28, -19,  -23],
+    # Bishop
+    [-29,   4, -82, -37, -25, -42,   7,  -8,
+     -26,  16, -18, -13,  30,  59,  18, -47,
+     -16,  37,  43,  40,  35,  50,  37,  -2,
+      -4,   5,  19,  50,  37,  37,   7,  -2,
+      -6,  13,  13,  26,  34,  12,  10,   4,
+       0,  15,  15,  15,  14,  27,  18,  10,
+       4,  15,  16,   0,   7,  21,  33,   1,
+     -33,  -3, -14, -21, -13, -12, -39, -21],
+    # Rook
+    [ 32,  42,  32,  51,  63,   9,  31,  43,
+      27,  32,  58,  62,  80,  67,  26,  44,
+      -5,  19,  26,  36,  17,  45,  61,  16,
+     -24, -11,   7,  26,  24,  35,  -8, -20,
+     -36, -26, -12,  -1,   9,  -7,   6, -23,
+     -45, -25, -16, -17,   3,   0,  -5, -33,
+     -44, -16, -20,  -9,  -1,  11,  -6, -71,
+     -19, -13,   1,  17,  16,   7, -37, -26],
+    # Queen
+    [-28,   0,  29,  12,  59,  44,  43,  45,
+     -24, -39,  -5,   1, -16,  57,  28,  54,
+     -13, -17,   7,   8,  29,  56,  47,  57,
+     -27, -27, -16, -16,  -1,  17,  -2,   1,
+      -9, -26,  -9, -10,  -2,  -4,   3,  -3,
+     -14,   2, -11,  -2,  -5,   2,  14,   5,
+     -35,  -8,  11,   2,   8,  15,  -3,   1,
+      -1, -18,  -9,  10, -15, -25, -31, -50],
+    # King
+    [-65,  23,  16, -15, -56, -34,   2,  13,
+      29,  -1, -20,  -7,  -8,  -4, -38, -29,
+      -9,  24,   2, -16, -20,   6,  22, -22,
+     -17, -20, -12, -27, -30, -25, -14, -36,
+     -49,  -1, -27, -39, -46, -44, -33, -51,
+     -14, -14, -22, -46, -44, -30, -15, -27,
+       1,   7,  -8, -64, -43, -16,   9,   8,
+     -15,  36,  12, -54,   8, -28,  24,  14],
+]
+
+EG_PST = [
+    None,
+    # Pawn
+    [  0,   0,   0,   0,   0,   0,   0,   0,
+     178, 173, 158, 134, 147, 132, 165, 187,
+      94, 100,  85,  67,  56,  53,  82,  84,
+      32,  24,  13,   5,  -2,   4,  17,  17,
+      13,   9,  -3,  -7,  -7,  -8,   3,  -1,
+       4,   7,  -6,   1,   0,  -5,  -1,  -8,
+      13,   8,   8,  10,  13,   0,   2,  -7,
+       0,   0,   0,   0,   0,   0,   0,   0],
+    # Knight
+    [-58, -38, -13, -28, -31, -27, -63, -99,
+     -25,  -8, -25,  -2,  -9, -25, -24, -52,
+     -24, -20,  10,   9,  -1,  -9, -19, -41,
+     -17,   3,  22,  22,  22,  11,   8, -18,
+     -18,  -6,  16,  25,  16,  17,   4, -18,
+     -23,  -3,  -1,  15,  10,  -3, -20, -22,
+     -42, -20, -10,  -5,  -2, -20, -23, -44,
+     -29, -51, -23, -15, -22, -18, -50, -64],
+    # Bishop
+    [-14, -21, -11,  -8,  -7,  -9, -17, -24,
+      -8,  -4,   7, -12,  -3, -13,  -4, -14,
+       2,  -8,   0,  -1,  -2,   6,   0,   4,
+      -3,   9,  12,   9,  14,  10,   3,   2,
+      -6,   3,  13,  19,   7,  10,  -3,  -9,
+     -12,  -3,   8,  10,  13,   3,  -7, -15,
+     -14, -18,  -7,  -1,   4,  -9, -15, -27,
+     -23,  -9, -23,  -5,  -9, -16,  -5, -17],
+    # Rook
+    [ 13,  10,  18,  15,  12,  12,   8,   5,
+      11,  13,  13,  11,  -3,   3,   8,   3,
+       7,   7,   7,   5,   4,  -3,  -5,  -3,
+       4,   3,  13,   1,   2,   1,  -1,   2,
+       3,   5,   8,   4,  -5,  -6,  -8, -11,
+      -4,   0,  -5,  -1,  -7, -12,  -8, -16,
+      -6,  -6,   0,   2,  -9,  -9, -11,  -3,
+      -9,   2,   3,  -1,  -5, -13,   4, -20],
+    # Queen
+    [ -9,  22,  22,  27,  27,  19,  10,  20,
+     -17,  20,  32,  41,  58,  25,  30,   0,
+     -20,   6,   9,  49,  47,  35,  19,   9,
+       3,  22,  24,  45,  57,  40,  57,  36,
+     -18,  28,  19,  47,  31,  34,  39,  23,
+     -16, -27,  15,   6,   9,  17,  10,   5,
+     -22, -23, -30, -16, -16, -23, -36, -32,
+     -33, -28, -22, -43,  -5, -32, -20, -41],
+    # King
+    [-74, -35, -18, -18, -11,  15,   4, -17,
+     -12,  17,  14,  17,  17,  38,  23,  11,
+      10,  17,  23,  15,  20,  45,  44,  13,
+      -8,  22,  24,  27,  26,  33,  26,   3,
+     -18,  -4,  21,  24,  27,  23,   9, -11,
+     -19,  -3,  11,  21,  23,  16,   7,  -9,
+     -27, -11,   4,  13,  14,   4,  -5, -17,
+     -53, -34, -21, -11, -28, -14, -24, -43],
+]
+
+
+def _signed_tables(values, pst):
+    """ Combine piece values and piece-square tables into tables indexed by
+    color, piece type and square.  Black's values are negated so that the
+    scores can simply be added together.
+    :param list[int] values: The value of each piece type
+    :param list[list[int]] pst: The piece-square table of each piece type
+    :return: The tables for black and white
+    :rtype: list[list[list[int]]]
+    """
+    tables = [[None] * 7, [None] * 7]
+    for piece_type in chess.PIECE_TYPES:
+        table = pst[piece_type]
+        tables[chess.WHITE][piece_type] = [
+            values[piece_type] + table[square ^ 56] for square in chess.SQUARES]
+        tables[chess.BLACK][piece_type] = [
+            -values[piece_type] - table[square] for square in chess.SQUARES]
+    return tables
+
+
+def _shield_masks(color):
+    """ Create the mask of the squares in front of the king for each square
+    :param chess.Color color: The color of the king
+    :return: The pawn shield bitboard for each king square
+    :rtype: list[int]
+    """
+    masks = []
+    step = 1 if color == chess.WHITE else -1
+    for square in chess.SQUARES:
+        file = chess.square_file(square)
+        rank = chess.square_rank(square)
+        mask = 0
+        for f in range(max(file - 1, 0), min(file + 1, 7) + 1):
+            for r in (rank + step, rank + 2 * step):
+                if 0 <= r < 8:
+                    mask |= chess.BB_SQUARES[chess.square(f, r)]
+        masks.append(mask)
+    return masks
+
+
+MG_TABLES = _signed_tables(MG_VALUES, MG_PST)
+EG_TABLES = _signed_tables(EG_VALUES, EG_PST)
+SHIELD_MASKS = [_shield_masks(chess.BLACK), _shield_masks(chess.WHITE)]
+
+
+class Evaluator:
+    def __init__(self, board=None):
+        """ Creates the evaluator for the given board
+        :param chess.Board or None board: The board to be evaluated
+        """
+        self.mg = 0
+        self.eg = 0
+        self.phase = MAX_PHASE
+        self._stack = []
+        if board is not None:
+            self.reset(board)
+
+    def reset(self, board):
+        """ Computes the piece-square scores of the board from scratch
+        :param chess.Board board: The board to be evaluated
+        """
+        self.mg = 0
+        self.eg = 0
+        self.phase = 0
+        self._stack.clear()
+        for square, piece in board.piece_map().items():
+            self.mg += MG_TABLES[piece.color][piece.piece_type][square]
+            self.eg += EG_TABLES[piece.color][piece.piece_type][square]
+            self.phase += PHASE_WEIGHTS[piece.piece_type]
+
+    def push(self, board, move):
+        """ Updates the piece-square scores for a move.  Must be called
+        before the move is pushed to the board.
+        :param chess.Board board: The board the move is about to be made on
+        :param chess.Move move: The legal move being made
+        """
+        self._stack.append((self.mg, self.eg, self.phase))
+        color = board.turn
+        mg_tables = MG_TABLES[color]
+        eg_tables = EG_TABLES[color]
+        from_square = move.from_square
+        to_square = move.to_square
+        piece_type = board.piece_type_at(from_square)
+        placed_type = move.promotion or piece_type
+
+        mg = (self.mg - mg_tables[piece_type][from_square] +
+              mg_tables[placed_type][to_square])
+        eg = (self.eg - eg_tables[piece_type][from_square] +
+              eg_tables[placed_type][to_square])
+        phase = self.phase + PHASE_WEIGHTS[placed_type]
+        phase -= PHASE_WEIGHTS[piece_type]
+
+        victim_type = board.piece_type_at(to_square)
+        if victim_type:
+            mg -= MG_TABLES[not color][victim_type][to_square]
+            eg -= EG_TABLES[not color][victim_type][to_square]
+            phase -= PHASE_WEIGHTS[victim_type]
+        elif piece_type == chess.PAWN and to_square == board.ep_square:
+            victim_square = to_square - 8 if color == chess.WHITE else to_square + 8
+            mg -= MG_TABLES[not color][chess.PAWN][victim_square]
+            eg -= EG_TABLES[not color][chess.PAWN][victim_square]
+        elif piece_type == chess.KING and abs(to_square - from_square) == 2:
+            # Castling also moves the rook
+            if to_square > from_square:
+                rook_from, rook_to = to_square + 1, to_square - 1
+            else:
+                rook_from, rook_to = to_square - 2, to_square + 1
+            mg += (mg_tables[chess.ROOK][rook_to] -
+                   mg_tables[chess.ROOK][rook_from])
+            eg += (eg_tables[chess.ROOK][rook_to] -
+                   eg_tables[chess.ROOK][rook_from])
+
+        self.mg = mg
+        self.eg = eg
+        self.phase = phase
+
+    def pop(self):
+        """ Restores the scores from before the last pushed move """
+        self.mg, self.eg, self.phase = self._stack.pop()
+
+    def evaluate(self, board):
+        """ Returns the score of the board, the piece-square scores are
+        tapered between middlegame and endgame by the material left on the
+        board and mobility and king safety are added to them
+        :param chess.Board board: The board being evaluated
+        :return: The score of the board in centipawns, positive when white is
+            better
+        :rtype: int
+        """
+        phase = self.phase if self.phase < MAX_PHASE else MAX_PHASE
+        mg = self.mg + self._king_safety(board)
+        score = (mg * phase + self.eg * (MAX_PHASE - phase)) // MAX_PHASE
+        return score + self._mobility(board)
+
+    @staticmethod
+    def _mobility(board):
+        """ Returns the mobility score of the board counting the squares
+        attacked by each piece that aren't occupied by its own pieces
+        :param chess.Board board: The board being evaluated
+        :return: White's mobility score minus black's
+        :rtype: int
+        """
+        score = 0
+        for color in chess.COLORS:
+            not_own = ~board.occupied_co[color]
+            side_score = 0
+            for piece_type in (chess.KNIGHT, chess.BISHOP, chess.ROOK,
+                               chess.QUEEN):
+                weight = MOBILITY_WEIGHTS[piece_type]
+                for square in chess.scan_forward(
+                        board.pieces_mask(piece_type, color)):
+                    side_score += weight * chess.popcount(
+                        board.attacks_mask(square) & not_own)
+            score += side_score if color == chess.WHITE else -side_score
+        return score
+
+    @staticmethod
+    def _king_safety(board):
+        """ Returns the king safety score of the board from the pawns
+        sheltering each king
+        :param chess.Board board: The board being evaluated
+        :return: White's king safety score minus black's
+        :rtype: int
+        """
+        score = 0
+        pawns = board.pawns
+        for color in chess.COLORS:
+            king = board.king(color)
+            if king is None:
+                continue
+            shield = SHIELD_MASKS[color][king] & pawns & board.occupied_co[color]
+            side_score = SHIELD_BONUS * chess.popcount(shield)
+            score += side_score if color == chess.WHITE else -side_score
+        return score
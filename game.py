@@ -1,21 +1,90 @@
 """ File: game.py
-This file contains the Game class which controls the logic for the game
+This file contains the Game class which controls the logic for the game.  
+The legal moves of the current position are generated once into a table of
+the moves from each square, which is thrown away when a move is pushed or 
+popped.
 """
 import chess
 from collections import deque
 
 
+# Captured piece values indexed by piece type
+PIECE_VALUES = [0, 1, 3, 3, 5, 9, 100]
+
+
 class Game:
+    # True while a computer move is being found in the background
+    thinking = False
+
     def __init__(self):
         self.board = chess.Board()
         self.captured_value = [0, 0]
         self.undone_moves = deque()
+        self._made_values = []
+        self._legal_table = None
+        self._legal_board = None
 
     def reset(self):
         """ Resets the game board and variables """
         self.board.reset()
         self.captured_value = [0, 0]
         self.undone_moves.clear()
+        self._legal_table = None
+
+    def legal_table(self):
+        """ Returns the legal moves of the current position by from square 
+        and to square, generating them the first time they are asked for
+        :return: The legal moves from each square to each square, more than
+            one for promotions
+        :rtype: dict{chess.Square: dict{chess.Square: list[chess.Move]}}
+        """
+        table = self._legal_table
+        # Games that are given a new board, such as search forks, mustn't 
+        # use the table of the old one
+        if table is None or self._legal_board is not self.board:
+            table = {}
+            for move in self.board.legal_moves:
+                table.setdefault(move.from_square, {}).setdefault(
+                    move.to_square, []).append(move)
+            self._legal_table = table
+            self._legal_board = self.board
+        return table
+
+    def legal_targets(self, from_square):
+        """ Returns the squares the piece on a square can move to
+        :param chess.Square from_square: The square of the piece
+        :return: The squares the piece can legally move to
+        :rtype: dict_keys
+        """
+        return self.legal_table().get(from_square, {}).keys()
+
+    def is_legal(self, move):
+        """ Returns whether a move is legal in the current position 
+        :param chess.Move move: The move to check
+        :return: True if the move is legal
+        :rtype: bool
+        """
+        targets = self.legal_table().get(move.from_square)
+        return targets is not None and move in targets.get(move.to_square, ())
+
+    def update(self):
+        """ Makes any move that was found in the background 
+        :return: True if the board changed
+        :rtype: bool
+        """
+        return False
+
+    def close(self):
+        """ Stops any background work of the game """
+
+    def key_press(self, key, text):
+        """ Handles a key pressed during the game
+        :param int key: The pygame key code of the key
+        :param str text: The text typed by the key
+        :return: True if the board changed
+        :rtype: bool
+        """
+        return False
 
     def get_move(self, from_coord, to_coord, promotion=None):
         """ Creates a move object whether or not it's legal 
@@ -40,14 +109,39 @@ class Game:
         :return: True if the move is legal
         :rtype: bool
         """
-        if move not in self.board.legal_moves:
+        if not self.is_legal(move):
             return False
 
         self.capture(move)
         self.board.push(move)
+        self._legal_table = None
         self.undone_moves.clear()
         return True
 
+    def make_move(self, move):
+        """ Make a move that is known to be legal.  Used by the search, the 
+        move is not validated and the undo history is left untouched.
+        :param chess.Move move: The legal move to make
+        """
+        board = self.board
+        victim = board.piece_type_at(move.to_square)
+        if victim:
+            value = PIECE_VALUES[victim]
+        elif board.is_en_passant(move):
+            value = PIECE_VALUES[chess.PAWN]
+        else:
+            value = 0
+        self.captured_value[board.turn] += value
+        self._made_values.append(value)
+        board.push(move)
+        self._legal_table = None
+
+    def unmake_move(self):
+        """ Take back the last move made with make_move """
+        self.board.pop()
+        self._legal_table = None
+        self.captured_value[self.board.turn] -= self._made_values.pop()
+
     def capture(self, move):
         """ If the move is a capture, add the captured piece's value to the 
         game score 
@@ -55,16 +149,11 @@ class Game:
         """
         if self.board.is_capture(move):
             color = 0 if self.board.turn == chess.BLACK else 1
-            captured_piece = self.board.piece_at(move.to_square)
-            if captured_piece:
-                if captured_piece.piece_type == chess.KING: val = 100
-                elif captured_piece.piece_type == chess.QUEEN: val = 9
-                elif captured_piece.piece_type == chess.ROOK: val = 5
-                elif captured_piece.piece_type == chess.BISHOP: val = 3
-                elif captured_piece.piece_type == chess.KNIGHT: val = 3
-                else: val = 1
+            captured_type = self.board.piece_type_at(move.to_square)
+            if captured_type:
+                val = PIECE_VALUES[captured_type]
             else: # En passant
-                val = 1
+                val = PIECE_VALUES[chess.PAWN]
             self.captured_value[color] += val
 
     def uncapture(self, move):
@@ -74,24 +163,20 @@ class Game:
         """
         if self.board.is_capture(move):
             color = 0 if self.board.turn == chess.BLACK else 1
-            captured_piece = self.board.piece_at(move.to_square)
-            if captured_piece:
-                if captured_piece.piece_type == chess.KING: val = 100
-                elif captured_piece.piece_type == chess.QUEEN: val = 9
-                elif captured_piece.piece_type == chess.ROOK: val = 5
-                elif captured_piece.piece_type == chess.BISHOP: val = 3
-                elif captured_piece.piece_type == chess.KNIGHT: val = 3
-                else: val = 1
+            captured_type = self.board.piece_type_at(move.to_square)
+            if captured_type:
+                val = PIECE_VALUES[captured_type]
             else: # En passant
-                val = 1
+                val = PIECE_VALUES[chess.PAWN]
             self.captured_value[color] -= val
 
     def undo_move(self):
         """ Undoes the last move made and adds it to the undone moves
         stack 
         """
-        if self.board.ply() != 0:
+        if self.board.move_stack:
             move = self.board.pop()
+            self._legal_table = None
             self.undone_moves.append(move)
             self.uncapture(move)
 
@@ -101,6 +186,7 @@ class Game:
             move = self.undone_moves.pop()
             self.capture(move)
             self.board.push(move)
+            self._legal_table = None
 
     def is_promotion(self, from_coord, to_coord):
         """ Returns whether or not the piece can be promted 
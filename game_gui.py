@@ -4,6 +4,7 @@ This file contains the GUI for the chess game
 import chess
 from gui import GUI
 import pygame
+from sprites import SOURCE_SIZE, get_sprites
 
 
 class GameGUI(GUI):
@@ -15,22 +16,51 @@ class GameGUI(GUI):
     WHITE = (255, 255, 255)
     LIGHT_GRAY = (241, 241, 241)
     SQUARE_COLORS = (CREAM, GREEN)
+    TARGET_SHADE = (0, 0, 0, 64)
 
     # Define Geometry
     BOARD_PORTION = 0.8
 
+    LAYOUT_ATTRIBUTES = GUI.LAYOUT_ATTRIBUTES + (
+        "game_surface", "white_promo_surf", "black_promo_surf")
+
     def __init__(self, dis, game):
         dis.fill(self.DARK_GRAY)
-        self.dis = dis
+        super().__init__(dis)
+        self.game = game
+        self.in_hand = None
+        self.board_flipped = False
+        self._sb_scores = None
+        self.invalidate()
+
+    def _define_layout(self):
+        """ Define the geometry, fonts, sprites and surfaces of the game GUI 
+        """
         self._define_geometry()
         self._define_fonts()
         self.SPRITES = self._get_sprites()
+        self.MARKERS = self._create_markers()
         self.game_surface = self._create_game_surface()
         self.white_promo_surf = self._white_promo_menu()
         self.black_promo_surf = self._black_promo_menu()
-        self.game = game
-        self.in_hand = None
-        self.board_flipped = False
+
+    def resize(self, dis):
+        """ Lays the game GUI out again after the window was resized, the 
+        next update redraws the whole window
+        :param pygame.Surface dis: The resized display
+        """
+        super().resize(dis)
+        self._sb_scores = None
+        self.invalidate()
+
+    def invalidate(self):
+        """ Forgets what was last drawn so the next update redraws the whole
+        window, called after something else has drawn over it
+        """
+        self._drawn_squares = None
+        self._drawn_flipped = None
+        self._hand_rect = None
+        self._sb_state = None
 
     def _define_geometry(self):
         """ Define geometry used in the game GUI """
@@ -38,11 +68,11 @@ class GameGUI(GUI):
         self.WIDTH, self.HEIGHT = self.dis.get_size()
 
         # Board Data
-        self.TRIAL_W = int((self.WIDTH * self.BOARD_PORTION // 8) // 5 * 5)
-        self.TRIAL_H = int((self.HEIGHT // 8) // 5 * 5)
+        self.TRIAL_W = int(self.WIDTH * self.BOARD_PORTION // 8)
+        self.TRIAL_H = int(self.HEIGHT // 8)
         self.SQUARE_SIZE = self.TRIAL_H 
         if self.TRIAL_W < self.TRIAL_H: self.SQUARE_SIZE = self.TRIAL_W
-        if self.SQUARE_SIZE > 100: self.SQUARE_SIZE = 100
+        if self.SQUARE_SIZE > SOURCE_SIZE: self.SQUARE_SIZE = SOURCE_SIZE
         self.BOARD_SIZE = 8 * self.SQUARE_SIZE
         self.FILE_LABEL_Y = self.BOARD_SIZE - (self.SQUARE_SIZE // 3)
         self.RANK_LABEL_X = self.SQUARE_SIZE // 14
@@ -80,6 +110,9 @@ class GameGUI(GUI):
                               self.SB_MARGIN)
         self.SB_SC_SCORE_W_X = self.SB_WIDTH // 4
         self.SB_SC_SCORE_B_X = 3 * self.SB_WIDTH // 4
+        # Thinking Label
+        self.SB_TH_Y = (self.SB_SC_SCORE_Y + self.SB_SC_LABEL_FONT + 
+                        2 * self.SB_MARGIN)
         # Flip Board Button
         self.SB_FB_X = self.SB_MARGIN
         self.SB_FB_Y = self.SB_MARGIN
@@ -122,17 +155,29 @@ class GameGUI(GUI):
                                               self.SB_SC_LABEL_FONT)
 
     def _get_sprites(self):
-        """ Define the sprites for each chess piece 
+        """ Define the sprites for each chess piece, shared with every other
+        board of the same square size
         :return: The dictionary containing the sprites for each piece
         :rtype: dict{str: pygame.Surface} 
         """
-        SPRITES = {}
-        for piece_char in "pnbrqk":
-            filepath_black = f"res/img/{self.SQUARE_SIZE}/b{piece_char}.png"
-            filepath_white = f"res/img/{self.SQUARE_SIZE}/w{piece_char}.png"
-            SPRITES[piece_char] = pygame.image.load(filepath_black)
-            SPRITES[piece_char.upper()] = pygame.image.load(filepath_white)
-        return SPRITES
+        return get_sprites(self.SQUARE_SIZE)
+
+    def _create_markers(self):
+        """ Creates the markers drawn on the squares the piece in hand can 
+        move to, a dot on empty squares and a ring around pieces that can be
+        captured
+        :return: The marker of empty squares and of captures, keyed by 
+            whether the square has a piece
+        :rtype: dict{bool: pygame.Surface}
+        """
+        size = self.SQUARE_SIZE
+        center = (size // 2, size // 2)
+        dot = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(dot, self.TARGET_SHADE, center, size // 6)
+        ring = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(ring, self.TARGET_SHADE, center, size // 2, 
+                           max(size // 12, 2))
+        return {False: dot, True: ring}
 
     def _create_game_surface(self):
         """ Creates the game surface to be used for the in-game interface.  
@@ -194,8 +239,20 @@ class GameGUI(GUI):
         return black_promo_surface
 
     def _get_results_menu(self, btn_hover=False):
+        """ Returns the results menu surface, rendered once for each outcome
+        and hover state
+        :param bool btn_hover: True if hovering over the button
+        :return: The result menu surface
+        :rtype: pygame.Surface
+        """
+        outcome = self.game.board.outcome()
+        return self.cached_surface(
+            ("results", outcome.winner, outcome.termination, btn_hover), 
+            lambda: self._render_results_menu(btn_hover))
+
+    def _render_results_menu(self, btn_hover):
         """ Create and return the results menu surface 
-        :param bool mm_hover: True if hovering over the button
+        :param bool btn_hover: True if hovering over the button
         :return: The result menu surface
         :rtype: pygame.Surface
         """
@@ -229,6 +286,25 @@ class GameGUI(GUI):
 
     def _get_SB(self, fb_hover=False, ud_hover=False, rd_hover=False, 
                 mm_hover=False, ng_hover=False):
+        """ Returns the sidebar surface, rendered once for each hover state
+        and thinking label until the captured values change
+        :param bool fb_hover: True if hovering over the flib board button
+        :param bool ud_hover: True if hovering over the undo button
+        :param bool rd_hover: True if hovering over the redo button
+        :param bool mm_hover: True if hovering over the main menu button
+        :param bool ng_hover: True if hovering over the new game button
+        :return: The sidebar surface
+        :rtype: pygame.Surface
+        """
+        scores = tuple(self.game.captured_value)
+        if scores != self._sb_scores:
+            self.forget_surfaces("sidebar")
+            self._sb_scores = scores
+        hover = (fb_hover, ud_hover, rd_hover, mm_hover, ng_hover)
+        return self.cached_surface(("sidebar", hover, self.game.thinking), 
+                                   lambda: self._render_SB(*hover))
+
+    def _render_SB(self, fb_hover, ud_hover, rd_hover, mm_hover, ng_hover):
         """ Creates and returns the sidebar surface 
         :param bool fb_hover: True if hovering over the flib board button
         :param bool ud_hover: True if hovering over the undo button
@@ -290,81 +366,163 @@ class GameGUI(GUI):
                         self.SB_FONT_SCORE, self.WHITE, 
                         str(self.game.captured_value[0]), SB_surf)
 
+        # Thinking Label
+        if self.game.thinking:
+            self.draw_label(self.SB_WIDTH // 2, self.SB_TH_Y, 
+                            self.SB_FONT_SCORE, self.LIGHT_GREEN, 
+                            "Thinking...", SB_surf)
+
         return SB_surf
 
     def update_display(self, pos):
-        """ Updates the display by clearing the display to the blank board 
-        surface.  Pieces are then drawn to the board including pieces held by
-        the user.
+        """ Updates the parts of the display that changed since the last 
+        update.  The pieces are compared with the ones last drawn and only 
+        the squares that changed, the old and new position of the piece held
+        by the user, the squares it can move to and the sidebar, if its 
+        hover state or labels changed, are redrawn and passed to 
+        pygame.display.update.
         :param tuple(int, int) pos: Tuple containing the x and y coordinates 
             of the cursor
         """
-        self.dis.blit(self.game_surface, (0, 0))
-        # Draw pieces on board
-        rank = 7
-        file = 0
+        full = (self._drawn_squares is None or 
+                self._drawn_flipped != self.board_flipped)
+        pieces = {}
         in_hand_char = None
-        for char in self.game.board.board_fen():
-            if char == '/':
-                file = 0
-                rank -= 1
-            elif char.isnumeric():
-                file += int(char)
-            elif self.in_hand == (file, rank):
-                in_hand_char = char
-                file += 1
+        for square, piece in self.game.board.piece_map().items():
+            if self.in_hand == (chess.square_file(square), 
+                                chess.square_rank(square)):
+                in_hand_char = piece.symbol()
             else:
-                x = file * self.SQUARE_SIZE
-                y = (7 - rank) * self.SQUARE_SIZE
-                if self.board_flipped:
-                    x = (7 - file) * self.SQUARE_SIZE
-                    y = rank * self.SQUARE_SIZE
-                self.dis.blit(self.SPRITES[char], (x, y))
-                file += 1
+                pieces[square] = piece.symbol()
 
-        # Draw piece in hand
+        # The piece on each square and whether the piece in hand can move 
+        # there, from the game's table of legal moves
+        squares = {square: (char, False) for square, char in pieces.items()}
         if self.in_hand and in_hand_char:
-                x, y = pos
-                x -= self.SQUARE_SIZE // 2
-                y -= self.SQUARE_SIZE // 2
-                self.dis.blit(self.SPRITES[in_hand_char], (x, y))
+            from_square = chess.square(*self.in_hand)
+            for square in self.game.legal_targets(from_square):
+                squares[square] = (pieces.get(square), True)
+
+        # Piece in hand
+        hand_rect = None
+        if self.in_hand and in_hand_char:
+            x, y = pos
+            hand_pos = (x - self.SQUARE_SIZE // 2, y - self.SQUARE_SIZE // 2)
+            hand_rect = pygame.Rect(hand_pos, (self.SQUARE_SIZE, 
+                                               self.SQUARE_SIZE))
+            hand_rect = hand_rect.clip(self.dis.get_rect())
+
+        # Damaged areas of the board, each is cleared and has the pieces in 
+        # it redrawn so overlapping areas don't draw a piece twice
+        if full:
+            self.dis.fill(self.DARK_GRAY)
+            self.dis.blit(self.game_surface, (0, 0))
+            for square, drawn in squares.items():
+                self._draw_square(square, drawn)
+            dirty = [pygame.Rect(0, 0, self.BOARD_SIZE, self.BOARD_SIZE)]
+        else:
+            dirty = [self._square_rect(square) for square in 
+                     set(squares) | set(self._drawn_squares) 
+                     if squares.get(square) != self._drawn_squares.get(square)]
+            if self._hand_rect is not None:
+                dirty.append(self._hand_rect)
+            for rect in dirty:
+                self.dis.set_clip(rect)
+                self.dis.fill(self.DARK_GRAY, rect)
+                self.dis.blit(self.game_surface, rect, rect)
+                for square, drawn in squares.items():
+                    if self._square_rect(square).colliderect(rect):
+                        self._draw_square(square, drawn)
+            self.dis.set_clip(None)
+
+        # Draw piece in hand
+        if hand_rect is not None:
+            self.dis.blit(self.SPRITES[in_hand_char], hand_pos)
+            dirty.append(hand_rect)
 
         # Update sidebar
+        sb_rect = pygame.Rect(self.BOARD_SIZE, 0, self.SB_WIDTH, 
+                              self.BOARD_SIZE)
+        hover = self._sb_hover(pos)
+        sb_state = (hover, tuple(self.game.captured_value), 
+                    self.game.thinking)
+        if (full or sb_state != self._sb_state or 
+            sb_rect.collidelist(dirty) != -1):
+            self.dis.blit(self._get_SB(**hover), sb_rect)
+            dirty.append(sb_rect)
+
+        self._drawn_squares = squares
+        self._drawn_flipped = self.board_flipped
+        self._hand_rect = hand_rect
+        self._sb_state = sb_state
+        if full:
+            pygame.display.update()
+        elif dirty:
+            pygame.display.update(dirty)
+
+    def _draw_square(self, square, drawn):
+        """ Draws the marker and piece of a square
+        :param chess.Square square: The square
+        :param tuple(str or None, bool) drawn: The symbol of the piece on 
+            the square and whether the piece in hand can move there
+        """
+        char, target = drawn
+        rect = self._square_rect(square)
+        if target:
+            self.dis.blit(self.MARKERS[char is not None], rect)
+        if char is not None:
+            self.dis.blit(self.SPRITES[char], rect)
+
+    def _square_rect(self, square):
+        """ Returns the area of the display a square is drawn in
+        :param chess.Square square: The square
+        :return: The area of the square
+        :rtype: pygame.Rect
+        """
+        file = chess.square_file(square)
+        rank = chess.square_rank(square)
+        x = file * self.SQUARE_SIZE
+        y = (7 - rank) * self.SQUARE_SIZE
+        if self.board_flipped:
+            x = (7 - file) * self.SQUARE_SIZE
+            y = rank * self.SQUARE_SIZE
+        return pygame.Rect(x, y, self.SQUARE_SIZE, self.SQUARE_SIZE)
+
+    def _sb_hover(self, pos):
+        """ Returns which sidebar button the cursor is over 
+        :param tuple(int, int) pos: Tuple containing the x and y coordinates 
+            of the cursor
+        :return: The keyword argument of _get_SB for the hovered button, 
+            empty if there is none
+        :rtype: dict{str: bool}
+        """
         x, y = pos
         if (x > self.SB_FB_X_ABS and 
             x < self.SB_FB_X_ABS + self.SB_BTN_WIDTH and 
             y > self.SB_FB_Y_ABS and 
             y < self.SB_FB_Y_ABS + self.SB_BTN_HEIGHT):
-            self.dis.blit(self._get_SB(fb_hover=True), 
-                          (self.BOARD_SIZE, 0))
+            return {"fb_hover": True}
         elif (x > self.SB_UD_X_ABS and 
             x < self.SB_UD_X_ABS + self.SB_UD_WIDTH and 
             y > self.SB_UD_Y_ABS and 
             y < self.SB_UD_Y_ABS + self.SB_BTN_HEIGHT):
-            self.dis.blit(self._get_SB(ud_hover=True), 
-                          (self.BOARD_SIZE, 0))
+            return {"ud_hover": True}
         elif (x > self.SB_RD_X_ABS and 
             x < self.SB_RD_X_ABS + self.SB_RD_WIDTH and 
             y > self.SB_RD_Y_ABS and 
             y < self.SB_RD_Y_ABS + self.SB_BTN_HEIGHT):
-            self.dis.blit(self._get_SB(rd_hover=True), 
-                          (self.BOARD_SIZE, 0))
+            return {"rd_hover": True}
         elif (x > self.SB_MM_X_ABS and 
             x < self.SB_MM_X_ABS + self.SB_BTN_WIDTH and 
             y > self.SB_MM_Y_ABS and 
             y < self.SB_MM_Y_ABS + self.SB_BTN_HEIGHT):
-            self.dis.blit(self._get_SB(mm_hover=True), 
-                          (self.BOARD_SIZE, 0))
+            return {"mm_hover": True}
         elif (x > self.SB_NG_X_ABS and 
             x < self.SB_NG_X_ABS + self.SB_BTN_WIDTH and 
             y > self.SB_NG_Y_ABS and 
             y < self.SB_NG_Y_ABS + self.SB_BTN_HEIGHT):
-            self.dis.blit(self._get_SB(ng_hover=True), 
-                          (self.BOARD_SIZE, 0))                        
-        else:
-            self.dis.blit(self._get_SB(), (self.BOARD_SIZE, 0))
-
-        pygame.display.update()
+            return {"ng_hover": True}
+        return {}
 
     def click(self, pos):
         """ Called when the mouse is left clicked.  If clicked in the sidebar,
@@ -447,11 +605,11 @@ class GameGUI(GUI):
         else:
             self.dis.blit(self.black_promo_surf, (file * self.SQUARE_SIZE, 
                                                   4 * self.SQUARE_SIZE))
+        self.invalidate()
         pygame.display.update()
 
         # Get response
         while True:
-            pygame.time.delay(50)
             event = pygame.event.wait()
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -480,6 +638,7 @@ class GameGUI(GUI):
         else:
             result_menu = self._get_results_menu()
         self.dis.blit(result_menu, (self.RM_X, self.RM_Y))
+        self.invalidate()
         pygame.display.update()
 
     def menu_click(self, pos):
@@ -1,11 +1,99 @@
 """ File: gui.py
 This file contains the GUI class which contains methods used for the a
-pplications GUI.
+pplications GUI.  Rendered text and pre-rendered surfaces are cached so 
+redrawing an unchanged part of the interface is a single blit.  The layout
+of each window size is kept so resizing back to a size reuses it.
 """
+from collections import OrderedDict
 import pygame
 
 
+MAX_LAYOUTS = 8         # Window sizes whose layouts are kept
+
+
 class GUI:
+    # Attributes of the layout besides the UPPERCASE geometry, fonts and 
+    # sprites
+    LAYOUT_ATTRIBUTES = ("_text_cache", "_surface_cache")
+
+    # Layout of each GUI class and window size, least recently used first
+    _layouts = OrderedDict()
+
+    def __init__(self, dis):
+        self.dis = dis
+        self.layout()
+
+    def layout(self):
+        """ Lays the GUI out for the size of the display, reusing the layout
+        from the last time the display had this size
+        """
+        key = (type(self).__name__, self.dis.get_size())
+        layout = GUI._layouts.get(key)
+        if layout is not None:
+            GUI._layouts.move_to_end(key)
+            vars(self).update(layout)
+            return
+
+        self._text_cache = {}
+        self._surface_cache = {}
+        self._define_layout()
+        GUI._layouts[key] = {name: value for name, value in vars(self).items()
+                             if name.isupper() or 
+                             name in self.LAYOUT_ATTRIBUTES}
+        if len(GUI._layouts) > MAX_LAYOUTS:
+            GUI._layouts.popitem(last=False)
+
+    def _define_layout(self):
+        """ Define the geometry, fonts and surfaces that depend on the size
+        of the display 
+        """
+
+    def resize(self, dis):
+        """ Lays the GUI out again after the window was resized
+        :param pygame.Surface dis: The resized display
+        """
+        self.dis = dis
+        self.layout()
+
+    def render_text(self, font, fc, msg):
+        """ Returns the rendered text, rendering it only the first time it 
+        is asked for
+        :param pygame.font.Font font: The font of the text
+        :param pygame.Color or int or tuple (int, int, int [int]) fc: The 
+            color of the text
+        :param str msg: The text
+        :return: The rendered text
+        :rtype: pygame.Surface
+        """
+        key = (font, fc, msg)
+        text = self._text_cache.get(key)
+        if text is None:
+            text = font.render(msg, True, fc)
+            self._text_cache[key] = text
+        return text
+
+    def cached_surface(self, key, render):
+        """ Returns the surface stored under the key, rendering it only the 
+        first time it is asked for
+        :param tuple key: The key of the surface, its first item names the 
+            kind of surface
+        :param function render: Returns the surface when it isn't cached
+        :return: The surface
+        :rtype: pygame.Surface
+        """
+        surface = self._surface_cache.get(key)
+        if surface is None:
+            surface = render()
+            self._surface_cache[key] = surface
+        return surface
+
+    def forget_surfaces(self, kind):
+        """ Removes the cached surfaces of one kind 
+        :param str kind: The first item of the keys of the surfaces
+        """
+        for key in [key for key in self._surface_cache if key[0] == kind]:
+            del self._surface_cache[key]
+
     def draw_button(self, x, y, w, h, ac, ic, font, fc, msg, surf, active):
         """ Draw a button given the following parameters
         
@@ -28,8 +116,7 @@ class GUI:
         pygame.draw.rect(surf, color, (x, y, w, h))
         self.draw_label(x + w // 2, y + h // 2, font, fc, msg, surf)
 
-    @staticmethod
-    def draw_label(x, y, font, fc, msg, surf):
+    def draw_label(self, x, y, font, fc, msg, surf):
         """ Draw a label the following parameters
         
         :param int x: The x-coordinate of the middle-center of the label
@@ -40,7 +127,7 @@ class GUI:
         :param str msg: The text for the label
         :param pygame.Surface surf: The surface that the button is drawn on
         """
-        label = font.render(msg, True, fc)
+        label = self.render_text(font, fc, msg)
         width = label.get_width()
         height = label.get_height()
         surf.blit(label, [x - width // 2, y - height // 2])
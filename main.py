@@ -1,13 +1,6 @@
 """ File: main.py
 This is the main file for the chess application.  It contains the mainloop 
 and control flow for the application.
-
-To Do:
-Improve position evaluation by adding the following parameters:
-    - Pieces Captured (already added)   - 100x piece value
-    - King Safety                       - Castle worth 100
-    - Possible Moves                    - 10 points for each legal move
-    - Pawn Rank                         - 30 points for each rank a pawn has advanced
 """
 import pygame
 pygame.init()
@@ -17,11 +10,18 @@ from enum import Enum
 from game import Game
 from game_gui import GameGUI
 from menu_gui import MenuGUI
+from opening_book import close_books
+from pgn_browser import PGNBrowser
+from scheduler import FrameScheduler
+from search_cache import close_caches
+import argparse
 
 
 # Window Geometry
 WINDOW_WIDTH = 860
 WINDOW_HEIGHT = 680
+MIN_WIDTH = 430
+MIN_HEIGHT = 340
 
 
 class GameState(Enum):
@@ -30,48 +30,87 @@ class GameState(Enum):
     MENU = 0
     MULTIPLAYER = 1
     SINGLEPPLAYER = 2
+    BROWSER = 3
 
 
-def main():
-    """ Set up and control the flow of the application """
-    dis = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+def main(frame_stats=False, pgn_filename=None):
+    """ Set up and control the flow of the application 
+    :param bool frame_stats: True to print the input latency and idle time
+        measured by the scheduler on exit
+    :param str or None pgn_filename: A pgn file to open in the game browser
+        instead of showing the menu
+    """
+    dis = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), 
+                                  pygame.RESIZABLE)
     pygame.display.set_caption('Chess')
-    game_state = GameState.MENU
+    scheduler = FrameScheduler()
+    game_state = GameState.BROWSER if pgn_filename else GameState.MENU
     while True:
+        # The window may have been resized by the last screen
+        dis = pygame.display.get_surface()
         if game_state == GameState.SINGLEPPLAYER:
-            game_state = singleplayer(dis)
+            game_state = singleplayer(dis, scheduler)
 
         elif game_state == GameState.MULTIPLAYER:
-            game_state = multiplayer(dis)
+            game_state = multiplayer(dis, scheduler)
+
+        elif game_state == GameState.BROWSER:
+            game_state = browser(dis, scheduler, pgn_filename)
 
         if game_state == GameState.MENU:
-            game_state = menu(dis)
+            game_state = menu(dis, scheduler)
 
         if game_state == GameState.QUIT:
+            close_books()
+            close_caches()
             pygame.quit()
+            if frame_stats:
+                for name, value in scheduler.report().items():
+                    print(f"{name}: {value:.3f}" if isinstance(value, float)
+                          else f"{name}: {value}")
             return
 
 
-def menu(dis):
+def resize_display(event):
+    """ Returns the display after a window resize event, enlarging the 
+    window if it was made smaller than the minimum size
+    :param pygame.event.Event event: The VIDEORESIZE event
+    :return: The display of the application
+    :rtype: pygame.Surface
+    """
+    width, height = event.size
+    if width < MIN_WIDTH or height < MIN_HEIGHT:
+        return pygame.display.set_mode((max(width, MIN_WIDTH), 
+                                        max(height, MIN_HEIGHT)), 
+                                       pygame.RESIZABLE)
+    return pygame.display.get_surface()
+
+
+def menu(dis, scheduler):
     """ Sets up and shows the menu for the application 
     :param pygame.Surface dis: The display of the application
+    :param FrameScheduler scheduler: Runs the loop of the menu
     :return: The game state after completion
     :rtype: GameState
     """
     gui = MenuGUI(dis)
     pos = (0, 0)
-    gui.update_display(pos)
+    scheduler.frame(lambda: gui.update_display(pos))
 
     # Menu Loop
     while True:
-        pygame.time.delay(15)
-
-        for event in pygame.event.get():
+        need_update = False
+        for event in scheduler.events():
             if event.type == pygame.QUIT:
                 return GameState.QUIT
 
+            if event.type == pygame.VIDEORESIZE:
+                gui.resize(resize_display(event))
+                need_update = True
+
             if event.type == pygame.MOUSEMOTION:
-                gui.update_display(event.pos)
+                pos = event.pos
+                need_update = True
 
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 choice = gui.click(event.pos)
@@ -80,41 +119,57 @@ def menu(dis):
                 if choice == 2:
                     return GameState.SINGLEPPLAYER
 
+        if need_update:
+            scheduler.frame(lambda: gui.update_display(pos))
 
-def multiplayer(dis):
+
+def multiplayer(dis, scheduler):
     game = Game()
-    return play(dis, game)
+    return play(dis, game, scheduler)
+
+
+def singleplayer(dis, scheduler):
+    game = AIGame(background=True, ponder=True, search_cache=True)
+    return play(dis, game, scheduler)
 
 
-def singleplayer(dis):
-    game = AIGame()
-    return play(dis, game)
+def browser(dis, scheduler, pgn_filename):
+    game = PGNBrowser(pgn_filename)
+    return play(dis, game, scheduler)
 
 
-def play(dis, game):
-    """ Sets up and runs the chess game
+def play(dis, game, scheduler):
+    """ Sets up and runs the chess game.  The loop blocks on events, only 
+    polling while the AI is thinking so its move is made once it is ready.
     :param pygame.Surface dis: The display of the application
+    :param Game game: The game to play
+    :param FrameScheduler scheduler: Runs the loop of the game
     :return: The game state after completion
     :rtype: GameState
     """
     gui = GameGUI(dis, game)
     pos = (0, 0)
-    gui.update_display(pos)
+    scheduler.frame(lambda: gui.update_display(pos))
     need_update = False
 
     # Game Loop
     while True:
-        if not gui.in_hand:
-            pygame.time.delay(50)
-
-        for event in pygame.event.get():
+        for event in scheduler.events(poll=game.thinking):
             if event.type == pygame.QUIT:
+                game.close()
                 return GameState.QUIT
 
+            if event.type == pygame.VIDEORESIZE:
+                dis = resize_display(event)
+                gui.resize(dis)
+                need_update = True
+
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 result = gui.click(event.pos)
                 if result == 1: game.reset()
-                if result == 2: return GameState.MENU
+                if result == 2:
+                    game.close()
+                    return GameState.MENU
                 need_update = True
 
             if event.type == pygame.MOUSEMOTION:
@@ -125,30 +180,54 @@ def play(dis, game):
                 gui.put_piece(event.pos)
                 need_update = True
 
+            if (event.type == pygame.KEYDOWN and 
+                game.key_press(event.key, event.unicode)):
+                need_update = True
+
+        if game.update():
+            need_update = True
+
         if need_update:
-            gui.update_display(pos)
+            scheduler.frame(lambda: gui.update_display(pos))
             need_update = False
             if game.is_game_over():
                 break
 
     # Results Menu
-    gui.display_menu((0, 0))
+    pos = (0, 0)
+    scheduler.frame(lambda: gui.display_menu(pos))
     while True:
-        pygame.time.delay(15)
-
-        for event in pygame.event.get():
+        need_update = False
+        for event in scheduler.events():
             if event.type == pygame.QUIT:
+                game.close()
                 return GameState.QUIT
+
+            if event.type == pygame.VIDEORESIZE:
+                dis = resize_display(event)
+                gui.resize(dis)
+                gui.update_display((0, 0))
+                need_update = True
         
             if event.type == pygame.MOUSEMOTION:
-                gui.display_menu(event.pos)
+                pos = event.pos
+                need_update = True
 
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 choice = gui.menu_click(event.pos)
                 if choice == 1:
                     game.reset()
-                    return play(dis, game)
+                    return play(dis, game, scheduler)
+
+        if need_update:
+            scheduler.frame(lambda: gui.display_menu(pos))
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Play chess")
+    parser.add_argument("--frame-stats", action="store_true",
+                        help="print input latency and idle time on exit")
+    parser.add_argument("--pgn", metavar="FILE",
+                        help="browse the games of a pgn file")
+    args = parser.parse_args()
+    main(args.frame_stats, args.pgn)
@@ -14,10 +14,21 @@ class MenuGUI(GUI):
 
     def __init__(self, dis):
         dis.fill(self.DARK_GRAY)
-        self.dis = dis
+        super().__init__(dis)
+        self._drawn = None
+
+    def _define_layout(self):
+        """ Define the geometry and fonts of the menu GUI """
         self._define_geometry()
         self._define_fonts()
 
+    def resize(self, dis):
+        """ Lays the menu out again after the window was resized 
+        :param pygame.Surface dis: The resized display
+        """
+        super().resize(dis)
+        self._drawn = None
+
     def _define_geometry(self):
         """ Define geometry used in the menu GUI """
         # Window Data
@@ -44,38 +55,52 @@ class MenuGUI(GUI):
                                               self.HEIGHT // 25)
 
     def update_display(self, pos):
-        """ Updates the display by clearing the display to the blank board 
-        surface.  Pieces are then drawn to the board including pieces held by 
-        the user.
+        """ Updates the display with the menu for the buttons the cursor is 
+        over.  Each hover state is rendered once and the display is only 
+        updated when the hover state changes.
         :param tuple(int, int) pos: Tuple containing the x and y coordinates 
             of the cursor
         """
-        self.dis.fill(self.DARK_GRAY)
+        x, y = pos
+        mp_hover = (self.MP_BTN_X < x < self.MP_BTN_X + self.BUTTON_WIDTH and
+                    self.MP_BTN_Y < y < self.MP_BTN_Y + self.BUTTON_HEIGHT)
+        sp_hover = (self.SP_BTN_X < x < self.SP_BTN_X + self.BUTTON_WIDTH and 
+                 self.SP_BTN_Y < y < self.SP_BTN_Y + self.BUTTON_HEIGHT)
+        if self._drawn == (mp_hover, sp_hover):
+            return
+        self._drawn = (mp_hover, sp_hover)
+        self.dis.blit(self.cached_surface(
+            ("menu", mp_hover, sp_hover), 
+            lambda: self._get_menu(mp_hover, sp_hover)), (0, 0))
+        pygame.display.update()
+
+    def _get_menu(self, mp_hover, sp_hover):
+        """ Creates and returns the menu surface 
+        :param bool mp_hover: True if hovering over the multiplayer button
+        :param bool sp_hover: True if hovering over the singleplayer button
+        :return: The menu surface
+        :rtype: pygame.Surface
+        """
+        menu_surf = pygame.Surface((self.WIDTH, self.HEIGHT))
+        menu_surf.fill(self.DARK_GRAY)
 
         # Write Heading
         self.draw_label(self.WIDTH // 2, self.HEADING_Y, self.HEADING_FONT, 
-                        self.WHITE, "Welcome to Chess!", self.dis)
+                        self.WHITE, "Welcome to Chess!", menu_surf)
 
         # Draw Multiplayer Button
-        x, y = pos
-        mp_hover = (self.MP_BTN_X < x < self.MP_BTN_X + self.BUTTON_WIDTH and
-                    self.MP_BTN_Y < y < self.MP_BTN_Y + self.BUTTON_HEIGHT)
-
         self.draw_button(self.MP_BTN_X, self.MP_BTN_Y, self.BUTTON_WIDTH, 
                          self.BUTTON_HEIGHT, self.LIGHT_GREEN, self.GREEN, 
                          self.LABEL_FONT, self.WHITE, "Multiplayer Game", 
-                         self.dis, mp_hover)
+                         menu_surf, mp_hover)
 
         # Draw Singleplayer Button
-        sp_hover = (self.SP_BTN_X < x < self.SP_BTN_X + self.BUTTON_WIDTH and 
-                 self.SP_BTN_Y < y < self.SP_BTN_Y + self.BUTTON_HEIGHT)
-
         self.draw_button(self.SP_BTN_X, self.SP_BTN_Y, self.BUTTON_WIDTH, 
                          self.BUTTON_HEIGHT, self.LIGHT_GREEN, self.GREEN, 
                          self.LABEL_FONT, self.WHITE, "Singleplayer Game", 
-                         self.dis, sp_hover)
+                         menu_surf, sp_hover)
 
-        pygame.display.update()
+        return menu_surf
 
     def click(self, pos):
         """ Returns the value 1 if the button is clicked 
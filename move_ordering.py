@@ -0,0 +1,123 @@
+""" File: move_ordering.py
+This file contains the MoveOrderer class which decides the order moves are
+tried in by the search so that alpha beta cutoffs happen as early as possible
+"""
+import chess
+
+
+# Piece values used to order captures, indexed by piece type
+VICTIM_VALUES = [0, 1, 3, 3, 5, 9, 100]
+MAX_PLY = 128
+
+# Centipawns gained by capturing or promoting to each piece type
+GAIN_VALUES = [0, 100, 320, 330, 500, 900, 0]
+PROMOTION_RANKS = [chess.BB_RANK_2, chess.BB_RANK_7]
+
+
+def tactical_moves(board):
+    """ Returns the legal captures and promotions of the board ordered by
+    most valuable victim / least valuable attacker
+    :param chess.Board board: The position to find the moves for
+    :return: The moves along with the most material they can gain, best
+        first
+    :rtype: list[tuple(int, chess.Move)]
+    """
+    scored = []
+    for move in board.generate_legal_captures():
+        victim = board.piece_type_at(move.to_square) or chess.PAWN
+        attacker = board.piece_type_at(move.from_square)
+        gain = GAIN_VALUES[victim]
+        if move.promotion:
+            gain += GAIN_VALUES[move.promotion] - GAIN_VALUES[chess.PAWN]
+        scored.append((10 * VICTIM_VALUES[victim] - VICTIM_VALUES[attacker],
+                       gain, move))
+    promoting = board.pawns & PROMOTION_RANKS[board.turn]
+    if promoting:
+        for move in board.generate_legal_moves(promoting, ~board.occupied):
+            gain = GAIN_VALUES[move.promotion] - GAIN_VALUES[chess.PAWN]
+            scored.append((VICTIM_VALUES[move.promotion], gain, move))
+    scored.sort(key=lambda entry: entry[0], reverse=True)
+    return [(gain, move) for _, gain, move in scored]
+
+
+class MoveOrderer:
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
+
+    def new_search(self):
+        """ Clears the killer moves and ages the history table so moves from
+        the last search still count but less than new ones
+        """
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        for table in self.history:
+            for i in range(4096):
+                table[i] >>= 1
+
+    def moves(self, board, hash_move, ply):
+        """ Lazily yields the legal moves in the order they should be
+        searched: the hash move, captures and promotions by most valuable
+        victim / least valuable attacker, killer moves and then quiet moves
+        by their history score.  Moves are only generated once the hash move
+        has failed to cause a cutoff.
+        :param chess.Board board: The position to order moves for
+        :param chess.Move or None hash_move: Best move from the
+            transposition table
+        :param int ply: Distance from the root of the search
+        :return: Generator of the ordered legal moves
+        :rtype: Generator[chess.Move]
+        """
+        if hash_move is not None and board.is_legal(hash_move):
+            yield hash_move
+        else:
+            hash_move = None
+
+        # Captures and promotions
+        tactical = []
+        quiet = []
+        for move in board.legal_moves:
+            if move == hash_move:
+                continue
+            if board.is_capture(move):
+                victim = board.piece_type_at(move.to_square) or chess.PAWN
+                attacker = board.piece_type_at(move.from_square)
+                tactical.append((10 * VICTIM_VALUES[victim] -
+                                 VICTIM_VALUES[attacker], move))
+            elif move.promotion:
+                tactical.append((VICTIM_VALUES[move.promotion], move))
+            else:
+                quiet.append(move)
+        tactical.sort(key=lambda scored: scored[0], reverse=True)
+        for _, move in tactical:
+            yield move
+
+        # Killer moves
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        for killer in killers:
+            if killer is not None and killer in quiet:
+                quiet.remove(killer)
+                yield killer
+
+        # Quiet moves
+        history = self.history[board.turn]
+        quiet.sort(key=lambda move: history[move.from_square * 64 +
+                                            move.to_square], reverse=True)
+        yield from quiet
+
+    def cutoff(self, board, move, depth, ply):
+        """ Records a quiet move that caused a beta cutoff as a killer move
+        for the ply and raises its history score
+        :param chess.Board board: The position the move was made from
+        :param chess.Move move: The move that caused the cutoff
+        :param int depth: The remaining depth the move was searched at
+        :param int ply: Distance from the root of the search
+        """
+        if board.is_capture(move) or move.promotion:
+            return
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self.history[board.turn][move.from_square * 64 +
+                                 move.to_square] += depth * depth
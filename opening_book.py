@@ -0,0 +1,287 @@
+""" File: opening_book.py
+This file contains the opening book backends the AI plays its first moves
+from.  Every backend opens its file or connection lazily on the first probe
+and get_book shares one instance of each backend between all games, so
+starting a game costs nothing and only the chosen backend's storage has to
+exist.
+"""
+import chess
+import chess.polyglot
+import os
+import sqlite3
+import threading
+
+
+# Binary openings book written by res/db_generation/db_generator.py
+BOOK_FILENAME = "res/book.bin"
+
+# Openings database file written by res/db_generation/db_generator.py
+SQLITE_FILENAME = "res/openings.db"
+
+# Openings Database
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "passwd": "briansql",
+    "database": "chess_openings"
+}
+DB_POOL_SIZE = 4
+BOOK_QUERY = ("SELECT name FROM moves WHERE fen = %s "
+              "ORDER BY count DESC LIMIT 1")
+SQLITE_BOOK_QUERY = BOOK_QUERY.replace("%s", "?")
+SQLITE_ALL_QUERY = "SELECT fen, name, count FROM moves"
+
+# Backends tried in order by get_book when no backend is named
+BACKENDS = ("polyglot", "sqlite", "mysql")
+
+# Shared instance of each backend
+_books = {}
+_books_lock = threading.Lock()
+
+
+class OpeningBook:
+    """ Base class of the opening book backends """
+
+    # True if find may run on several threads at once, otherwise probes 
+    # take turns
+    concurrent = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.opened = False
+
+    def probe(self, board):
+        """ Returns the book move of a position, opening the book on first
+        use.  A book that can't be opened is treated as empty.
+        :param chess.Board board: The position to look up
+        :return: The most played move or None if the position isn't in the
+            book
+        :rtype: chess.Move or None
+        """
+        with self._lock:
+            if not self.opened:
+                self.opened = True
+                try:
+                    self.open()
+                except Exception:
+                    self.close()
+                    return None
+            if not self.concurrent:
+                return self.find(board)
+        return self.find(board)
+
+    def available(self):
+        """ Returns whether the book's storage exists without opening it
+        :rtype: bool
+        """
+        return True
+
+    def open(self):
+        """ Opens the file or connection of the book """
+
+    def find(self, board):
+        """ Looks up the book move of a position in the open book
+        :param chess.Board board: The position to look up
+        :return: The most played move or None if the position isn't in the
+            book
+        :rtype: chess.Move or None
+        """
+        return None
+
+    def close(self):
+        """ Closes the file or connection of the book """
+
+
+class PolyglotBook(OpeningBook):
+    def __init__(self, filename=BOOK_FILENAME):
+        """ Creates a binary Polyglot book, which is memory mapped and binary
+        searched
+        :param str filename: The name of the book file
+        """
+        super().__init__()
+        self.filename = filename
+        self.reader = None
+
+    def available(self):
+        return os.path.exists(self.filename)
+
+    def open(self):
+        self.reader = chess.polyglot.open_reader(self.filename)
+
+    def find(self, board):
+        if self.reader is None:
+            return None
+        try:
+            return self.reader.find(board).move
+        except IndexError:
+            return None
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+class SQLiteBook(OpeningBook):
+    def __init__(self, filename=SQLITE_FILENAME):
+        """ Creates a book in an embedded SQLite database with the same moves
+        table as the MySQL openings database
+        :param str filename: The name of the database file
+        """
+        super().__init__()
+        self.filename = filename
+        self.db = None
+
+    def available(self):
+        return os.path.exists(self.filename)
+
+    def open(self):
+        self.db = sqlite3.connect(f"file:{self.filename}?mode=ro", uri=True,
+                                  check_same_thread=False)
+
+    def find(self, board):
+        if self.db is None:
+            return None
+        selection = self.db.execute(SQLITE_BOOK_QUERY,
+                                    (board.board_fen(),)).fetchall()
+        if selection:
+            return chess.Move.from_uci(selection[0][0])
+        return None
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+class MySQLBook(OpeningBook):
+    concurrent = True
+
+    def __init__(self, config=DB_CONFIG):
+        """ Creates a book in the MySQL openings database.  Each probe 
+        checks a connection out of a pool for a prepared statement and 
+        returns it afterwards, so games can probe at the same time.
+        :param dict config: The connection arguments of the database
+        """
+        super().__init__()
+        self.config = config
+        self.pool = None
+
+    def open(self):
+        import mysql.connector.pooling
+        self.pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name="chess_openings", pool_size=DB_POOL_SIZE,
+            **self.config)
+
+    def find(self, board):
+        import mysql.connector.errors
+        pool = self.pool
+        if pool is None:
+            return None
+        try:
+            db = pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            # Every connection is in use, the move is searched instead
+            return None
+        try:
+            cursor = db.cursor(prepared=True)
+            try:
+                cursor.execute(BOOK_QUERY, (board.board_fen(),))
+                selection = cursor.fetchall()
+            finally:
+                cursor.close()
+        finally:
+            # Returns the connection to the pool
+            db.close()
+        if selection:
+            move_uci = selection[0][0]
+            if isinstance(move_uci, (bytes, bytearray)):
+                move_uci = move_uci.decode()
+            return chess.Move.from_uci(move_uci)
+        return None
+
+    def close(self):
+        self.pool = None
+
+
+class DictBook(OpeningBook):
+    def __init__(self, filename=SQLITE_FILENAME, moves=None):
+        """ Creates a book held in memory as a dictionary from board FEN to
+        the most played move, loaded once from an SQLite openings database
+        :param str filename: The name of the database file to load
+        :param dict{str: str} or None moves: The UCI move of each board FEN,
+            the file is not read when given
+        """
+        super().__init__()
+        self.filename = filename
+        self.moves = moves
+
+    def available(self):
+        return self.moves is not None or os.path.exists(self.filename)
+
+    def open(self):
+        if self.moves is not None:
+            return
+        best = {}
+        db = sqlite3.connect(f"file:{self.filename}?mode=ro", uri=True)
+        try:
+            for fen, name, count in db.execute(SQLITE_ALL_QUERY):
+                if fen not in best or count > best[fen][1]:
+                    best[fen] = (name, count)
+        finally:
+            db.close()
+        self.moves = {fen: name for fen, (name, _) in best.items()}
+
+    def find(self, board):
+        if self.moves is None:
+            return None
+        move_uci = self.moves.get(board.board_fen())
+        if move_uci is None:
+            return None
+        return chess.Move.from_uci(move_uci)
+
+
+def get_book(backend=None):
+    """ Returns the shared instance of an opening book backend
+    :param str or None backend: "polyglot", "sqlite", "mysql" or "dict",
+        when None the first of BACKENDS whose storage exists is used
+    :return: The opening book
+    :rtype: OpeningBook
+    """
+    with _books_lock:
+        if backend is None:
+            for name in BACKENDS:
+                book = _books.get(name) or _create_book(name)
+                if book.available():
+                    _books[name] = book
+                    return book
+            backend = BACKENDS[-1]
+        if backend not in _books:
+            _books[backend] = _create_book(backend)
+        return _books[backend]
+
+
+def _create_book(backend):
+    """ Creates an opening book backend with its default storage
+    :param str backend: "polyglot", "sqlite", "mysql" or "dict"
+    :return: The opening book
+    :rtype: OpeningBook
+    """
+    if backend == "polyglot":
+        return PolyglotBook()
+    if backend == "sqlite":
+        return SQLiteBook()
+    if backend == "mysql":
+        return MySQLBook()
+    if backend == "dict":
+        return DictBook()
+    raise ValueError(f"Unknown opening book backend: {backend}")
+
+
+def close_books():
+    """ Closes every shared opening book """
+    with _books_lock:
+        for book in _books.values():
+            with book._lock:
+                book.close()
+                book.opened = False
@@ -0,0 +1,263 @@
+""" File: pgn_browser.py
+This file contains the PGN game browser.  PGNIndex finds the byte offset of
+the start of each game in one streaming pass over a .pgn file and saves the
+offsets next to it, so reopening the file only checks the saved index.  A
+game is read and parsed only when it is selected, so memory use doesn't grow
+with the size of the file and any game can be jumped to with two seeks.
+
+PGNBrowser is the Game of the browser mode.  The moves of the selected game
+are stepped through with the undo and redo buttons or the arrow keys.
+
+Usage: python main.py --pgn <file.pgn>
+"""
+from array import array
+from game import Game
+import chess
+import chess.pgn
+from collections import deque
+import io
+import os
+import pygame
+import struct
+import tempfile
+
+
+GAME_START = b"[Event "     # First line of each game in the pgn file
+INDEX_SUFFIX = ".idx"       # Added to the pgn filename to name its index
+SCAN_CHUNK = 1 << 20        # Bytes of the pgn file scanned at a time
+WRITE_BATCH = 1 << 16       # Offsets buffered before writing them
+
+# Magic, pgn file size and modification time at the start of the index,
+# followed by one unsigned 64-bit offset per game
+INDEX_HEADER = struct.Struct("<8sQQ")
+INDEX_MAGIC = b"PGNIDX1\0"
+OFFSET = struct.Struct("<Q")
+
+
+class PGNIndex:
+    def __init__(self, filename):
+        """ Opens a pgn file, building its index if there is no index that
+        is up to date with the file
+        :param str filename: The name of the pgn file
+        """
+        self.filename = filename
+        self.index_filename = filename + INDEX_SUFFIX
+        stat = os.stat(filename)
+        self.size = stat.st_size
+        self._header = INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size,
+                                         stat.st_mtime_ns)
+        self._pgn = open(filename, "rb")
+        self._index = self._open_index()
+        if self._index is None:
+            self._index = self.build()
+        self._index.seek(0, os.SEEK_END)
+        self._games = ((self._index.tell() - INDEX_HEADER.size) //
+                       OFFSET.size)
+
+    def _open_index(self):
+        """ Opens the saved index if it was built from the file as it is now
+        :return: The index file or None if it is missing or out of date
+        :rtype: file or None
+        """
+        try:
+            index = open(self.index_filename, "rb")
+        except OSError:
+            return None
+        if index.read(INDEX_HEADER.size) != self._header:
+            index.close()
+            return None
+        return index
+
+    def build(self):
+        """ Finds the start of each game in one pass over the pgn file and
+        writes the offsets to the index, which is saved next to the pgn file
+        when the directory is writable
+        :return: The index file
+        :rtype: file
+        """
+        try:
+            index = open(self.index_filename + ".tmp", "w+b")
+        except OSError:
+            index = tempfile.TemporaryFile()
+        index.write(self._header)
+
+        offsets = array("Q")
+        # Each game starts at the beginning of a line, the newline before
+        # the file counts as the end of a line
+        tail = b"\n"
+        base = -1
+        self._pgn.seek(0)
+        while True:
+            chunk = self._pgn.read(SCAN_CHUNK)
+            if not chunk:
+                break
+            data = tail + chunk
+            found = data.find(b"\n" + GAME_START)
+            while found != -1:
+                offsets.append(base + found + 1)
+                found = data.find(b"\n" + GAME_START, found + 1)
+            if len(offsets) >= WRITE_BATCH:
+                self._write_offsets(index, offsets)
+            # Keep enough of the chunk to find a game start split across
+            # chunks but not enough to find one twice
+            tail = data[-len(GAME_START):]
+            base += len(data) - len(tail)
+        self._write_offsets(index, offsets)
+        index.flush()
+
+        if index.name == self.index_filename + ".tmp":
+            index.close()
+            os.replace(self.index_filename + ".tmp", self.index_filename)
+            index = open(self.index_filename, "rb")
+        return index
+
+    def _write_offsets(self, index, offsets):
+        """ Writes the buffered offsets to the index and empties the buffer
+        :param file index: The index file
+        :param array offsets: The offsets found since the last write
+        """
+        index.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+        del offsets[:]
+
+    def __len__(self):
+        return self._games
+
+    def offset(self, number):
+        """ Returns where a game starts in the pgn file
+        :param int number: The number of the game, from 0
+        :return: The byte offset of the game
+        :rtype: int
+        """
+        self._index.seek(INDEX_HEADER.size + number * OFFSET.size)
+        return OFFSET.unpack(self._index.read(OFFSET.size))[0]
+
+    def text(self, number):
+        """ Returns the text of a game
+        :param int number: The number of the game, from 0
+        :return: The pgn of the game
+        :rtype: str
+        """
+        if not 0 <= number < self._games:
+            raise IndexError(f"game {number} is not in {self.filename}")
+        start = self.offset(number)
+        end = (self.offset(number + 1) if number + 1 < self._games
+               else self.size)
+        self._pgn.seek(start)
+        return self._pgn.read(end - start).decode("utf-8", errors="replace")
+
+    def game(self, number):
+        """ Reads and parses a game
+        :param int number: The number of the game, from 0
+        :return: The game
+        :rtype: chess.pgn.Game
+        """
+        game = chess.pgn.read_game(io.StringIO(self.text(number)))
+        return game if game is not None else chess.pgn.Game()
+
+    def close(self):
+        """ Closes the pgn file and its index """
+        self._pgn.close()
+        self._index.close()
+
+
+class PGNBrowser(Game):
+    def __init__(self, filename):
+        """ Opens a pgn file and selects its first game
+        :param str filename: The name of the pgn file
+        """
+        super().__init__()
+        self.index = PGNIndex(filename)
+        self.number = 0
+        self.typed = ""
+        self.select(0)
+
+    def select(self, number):
+        """ Sets the board to the start of a game, its moves can then be
+        redone one by one
+        :param int number: The number of the game, from 0, it is clamped to
+            the games in the file
+        """
+        self.number = max(0, min(number, len(self.index) - 1))
+        if len(self.index):
+            pgn_game = self.index.game(self.number)
+        else:
+            pgn_game = chess.pgn.Game()
+        self.headers = pgn_game.headers
+        self.board = pgn_game.board()
+        self.captured_value = [0, 0]
+        self.undone_moves = deque(reversed(list(pgn_game.mainline_moves())))
+        self.typed = ""
+        self.update_caption()
+
+    def update_caption(self):
+        """ Shows the selected game, or the game number being typed, in the
+        window caption
+        """
+        if self.typed:
+            caption = f"Go to game {self.typed}"
+        else:
+            caption = (f"Game {self.number + 1}/{len(self.index)}: "
+                       f"{self.headers.get('White', '?')} - "
+                       f"{self.headers.get('Black', '?')} "
+                       f"{self.headers.get('Result', '*')}")
+        pygame.display.set_caption(caption)
+
+    def reset(self):
+        """ Returns to the start of the selected game """
+        self.select(self.number)
+
+    def key_press(self, key, text):
+        """ Steps through the moves with the left and right arrow keys,
+        home and end, and through the games with the up and down arrow keys
+        and page up and page down.  Typing a number and return jumps to that
+        game.
+        :param int key: The pygame key code of the key
+        :param str text: The text typed by the key
+        :return: True if the board changed
+        :rtype: bool
+        """
+        if text.isdigit():
+            self.typed += text
+        elif key == pygame.K_BACKSPACE:
+            self.typed = self.typed[:-1]
+        elif key == pygame.K_ESCAPE:
+            self.typed = ""
+        elif key in (pygame.K_RETURN, pygame.K_KP_ENTER) and self.typed:
+            self.select(int(self.typed) - 1)
+            return True
+        elif key == pygame.K_LEFT:
+            self.undo_move()
+            return True
+        elif key == pygame.K_RIGHT:
+            self.redo_move()
+            return True
+        elif key == pygame.K_HOME:
+            while self.board.move_stack:
+                self.undo_move()
+            return True
+        elif key == pygame.K_END:
+            while self.undone_moves:
+                self.redo_move()
+            return True
+        elif key in (pygame.K_UP, pygame.K_PAGEUP):
+            self.select(self.number - 1)
+            return True
+        elif key in (pygame.K_DOWN, pygame.K_PAGEDOWN):
+            self.select(self.number + 1)
+            return True
+        else:
+            return False
+        self.update_caption()
+        return False
+
+    def is_game_over(self):
+        """ Browsing doesn't end at the last move of a game
+        :return: False
+        :rtype: bool
+        """
+        return False
+
+    def close(self):
+        """ Closes the pgn file and restores the window caption """
+        self.index.close()
+        pygame.display.set_caption('Chess')
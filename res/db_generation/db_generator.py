@@ -3,127 +3,660 @@
 This file contains the opening database generator given a .pgn file.  
 Games using portable game notation (PGN) can be downloaded 
 at https://www.ficsgames.org/download.html
+
+Games are streamed from the file with chess.pgn and only the first 20 plies 
+of each are parsed.  Move counts are gathered for batches of games and 
+written with multi-row inserts, committing after each batch.  With more 
+than one worker the file is split into shards on game boundaries which are
+counted in a process pool, and the merged counts are written once.
+
+Each run rebuilds the database and book unless --incremental is given, 
+which adds the new games' counts to the existing ones instead.  A manifest
+of ingested files (by SHA-256 digest) and games (by hash of their headers 
+and opening moves) makes re-runs skip what has already been added; the 
+games of each batch or shard are looked up in it, so it isn't loaded whole.
+The exact counts of the book's moves are kept in the database with the 
+games they came from.  Rows a run adds to or changes are marked dirty and 
+only they are exported at the end of the run: the dirty rows of the moves
+table are upserted into the SQLite file and the book entries of the dirty 
+positions are rewritten from their exact counts.  The flags are cleared 
+once both files are written, so running an interrupted ingestion again 
+finishes it.  The book is a single sorted file, so adding positions to it 
+means rewriting it; it is merged in one streaming pass with the old book 
+rather than written again from the database.
+
+Along with the database, a binary openings book is written in the Polyglot
+format: entries of a 64-bit Zobrist hash of the position, the move, its 
+weight and an unused learn value, sorted by hash.  The moves table is also
+copied to an SQLite file so the AI can use the openings without a database 
+server.
 """
+import argparse
 import chess
+import chess.pgn
+import chess.polyglot
+from collections import Counter
+import hashlib
+import heapq
+import io
+import multiprocessing
 import mysql.connector
 import os
-import sys
+import sqlite3
+import struct
+import time
+
+
+MAX_PLIES = 20          # Plies of each game added to the database
+BATCH_GAMES = 5000      # Games read between database writes
+BATCH_ROWS = 10000      # Rows sent in one insert statement
+SHARDS_PER_WORKER = 4   # Shards the pgn file is split into for each worker
+GAME_START = b"[Event "
+BOOK_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                             "..", "book.bin")
+SQLITE_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                               "..", "openings.db")
+BOOK_ENTRY = struct.Struct(">QHHI")
+MAX_WEIGHT = 0xffff
+INSERT_MOVES = ("INSERT INTO moves (fen, name, count) VALUES (%s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE count = count + VALUES(count), "
+                "dirty = 1")
+INSERT_BOOK = ("INSERT INTO book (hash, move, count) VALUES (%s, %s, %s) "
+               "ON DUPLICATE KEY UPDATE count = count + VALUES(count), "
+               "dirty = 1")
+INSERT_GAMES = "INSERT IGNORE INTO games (hash) VALUES (%s)"
+INSERT_SOURCE = ("INSERT INTO sources (digest, name, games) "
+                 "VALUES (%s, %s, %s)")
+
+
+class EnoughPlies(ValueError):
+    """ Raised to stop parsing a game once MAX_PLIES have been read """
+
+
+class ShardReader(io.RawIOBase):
+    """ Reader of a byte range of a pgn file, so a shard can be streamed 
+    without reading past its end
+    """
+    def __init__(self, pgn_file, shard_end):
+        self.pgn_file = pgn_file
+        self.remaining = shard_end - pgn_file.tell()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), max(self.remaining, 0))
+        data = self.pgn_file.read(size)
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
 
 
-UCI_FILENAME = "uci.txt"
+class OpeningVisitor(chess.pgn.BaseVisitor):
+    """ Visitor for chess.pgn.read_game which collects the first MAX_PLIES
+    moves of the mainline of a standard game and skips the rest of it
+    """
+    def begin_game(self):
+        self.plies = []
+        self.headers = []
+        self.standard = True
+
+    def visit_header(self, tagname, tagvalue):
+        self.headers.append(f"{tagname}={tagvalue}")
+        if tagname == "FEN":
+            self.standard = False
+        elif tagname == "Variant" and tagvalue.lower() != "standard":
+            self.standard = False
+
+    def end_headers(self):
+        if not self.standard:
+            return chess.pgn.SKIP
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def parse_san(self, board, san):
+        if len(self.plies) >= MAX_PLIES:
+            raise EnoughPlies()
+        return board.parse_san(san)
+
+    def visit_move(self, board, move):
+        self.plies.append((board.board_fen(), move.uci(), 
+                           chess.polyglot.zobrist_hash(board), 
+                           polyglot_move(board, move)))
 
+    def handle_error(self, error):
+        # The rest of the game is skipped, the plies before the error are
+        # still used
+        pass
 
-def main(pgn_filename):
+    def result(self):
+        game_id = "\n".join(self.headers + [ply[1] for ply in self.plies])
+        return hashlib.md5(game_id.encode()).digest(), self.plies
+
+
+def main(pgn_filename, workers=1, incremental=False):
     """ Create an openings database using the given pgn file 
     :param str pgn_filename: The name of the pgn file
+    :param int workers: Number of processes to read the file with
+    :param bool incremental: True to add the games to the existing database
+        and book instead of rebuilding them
     """
-    clear_db()
+    if incremental:
+        create_tables()
+    else:
+        clear_db()
+
+    cnx = connect_db()
+    cursor = cnx.cursor()
+    digest = source_digest(pgn_filename)
+    cursor.execute("SELECT name FROM sources WHERE digest = %s", (digest,))
+    ingested = cursor.fetchall()
+    if ingested:
+        print(f"{pgn_filename} was already ingested as {ingested[0][0]}")
+        cursor.close()
+        cnx.close()
+        return
+
+    if workers > 1:
+        games = ingest_parallel(pgn_filename, workers, cnx, cursor)
+    else:
+        games = ingest(pgn_filename, cnx, cursor)
+
+    # Without --incremental the database was rebuilt, so every row is dirty
+    # and the old files are replaced rather than merged with
+    write_book(read_book_counts(cursor), BOOK_FILENAME, incremental)
+    export_sqlite(cursor, SQLITE_FILENAME, incremental)
+    cursor.execute("UPDATE moves SET dirty = 0 WHERE dirty = 1")
+    cursor.execute("UPDATE book SET dirty = 0 WHERE dirty = 1")
+    # The file is only recorded as ingested once the book has its games
+    cursor.execute(INSERT_SOURCE, (digest, os.path.basename(pgn_filename),
+                                   games))
+    cnx.commit()
+    cursor.close()
+    cnx.close()
+
+
+def ingest(pgn_filename, cnx, cursor):
+    """ Add the games of a pgn file that aren't in the database yet, 
+    writing the counts and game hashes of each batch of games as it is read
+    :param str pgn_filename: The name of the pgn file
+    :param mysql.connector.connection.MySQLConnection cnx: The connection to 
+        the openings database
+    :param mysql.connector.cursor.MySQLCursor cursor: The cursor for the 
+        openings database
+    :return: The number of games added
+    :rtype: int
+    """
+    batch = {}
+
+    start = time.perf_counter()
+    games = plies = rows = 0
+    with open(pgn_filename, encoding="utf-8", errors="replace") as pgn_file:
+        for game_hash, game_plies in read_openings(pgn_file):
+            batch[game_hash] = game_plies
+            if len(batch) == BATCH_GAMES:
+                added = write_games(batch, cursor)
+                cnx.commit()
+                games += added[0]
+                plies += added[1]
+                rows += added[2]
+                batch.clear()
+                report(games, plies, rows, time.perf_counter() - start)
+
+    added = write_games(batch, cursor)
+    cnx.commit()
+    games += added[0]
+    plies += added[1]
+    rows += added[2]
+    report(games, plies, rows, time.perf_counter() - start)
+    return games
+
+
+def write_games(batch, cursor):
+    """ Add the move and book counts of a batch of games to the database, 
+    skipping games that are already in the database
+    :param dict{bytes: list} batch: The opening plies of each game by hash
+    :param mysql.connector.cursor.MySQLCursor cursor: The cursor for the 
+        openings database
+    :return: The number of games, plies and rows added
+    :rtype: tuple(int, int, int)
+    """
+    if not batch:
+        return 0, 0, 0
+    for game_hash in known_games(batch, cursor):
+        del batch[game_hash]
+
+    db_counts = Counter()
+    book_counts = Counter()
+    plies = 0
+    for game_plies in batch.values():
+        count_plies(game_plies, db_counts, book_counts)
+        plies += len(game_plies)
+    cursor.executemany(INSERT_GAMES, [(game_hash,) for game_hash in batch])
+    rows = write_counts(db_counts, book_counts, cursor)
+    return len(batch), plies, rows
+
+
+def known_games(game_hashes, cursor):
+    """ Find which games are already in the database
+    :param Iterable[bytes] game_hashes: Hashes of the games to look up
+    :param mysql.connector.cursor.MySQLCursor cursor: The cursor for the 
+        openings database
+    :return: Hashes of the games that are in the database
+    :rtype: set[bytes]
+    """
+    game_hashes = list(game_hashes)
+    known = set()
+    for i in range(0, len(game_hashes), BATCH_ROWS):
+        hashes = game_hashes[i:i + BATCH_ROWS]
+        placeholders = ", ".join(["%s"] * len(hashes))
+        cursor.execute(f"SELECT hash FROM games WHERE hash IN "
+                       f"({placeholders})", hashes)
+        known.update(bytes(row[0]) for row in cursor.fetchall())
+    return known
+
+
+def ingest_parallel(pgn_filename, workers, cnx, cursor):
+    """ Add the games of a pgn file to the database by counting shards of 
+    the file in a process pool, merging the counts and writing them once.
+    The games of each shard are looked up in the database as its counts 
+    come back, and games that are already there are taken back.
+    :param str pgn_filename: The name of the pgn file
+    :param int workers: Number of processes to read the file with
+    :param mysql.connector.connection.MySQLConnection cnx: The connection to 
+        the openings database
+    :param mysql.connector.cursor.MySQLCursor cursor: The cursor for the 
+        openings database
+    :return: The number of games added
+    :rtype: int
+    """
+    db_counts = Counter()
+    book_counts = Counter()
+    shards = [(pgn_filename, shard_start, shard_end) for shard_start, 
+              shard_end in find_shards(pgn_filename, 
+                                       workers * SHARDS_PER_WORKER)]
+
+    start = time.perf_counter()
+    seen = set()
+    recounts = []
+    plies = 0
+    with multiprocessing.Pool(workers) as pool:
+        for shard, (shard_db, shard_book, shard_hashes, shard_plies) in zip(
+            shards, pool.imap(count_shard, shards)):
+            # A game in the database or in more than one shard is only 
+            # counted in the first shard it isn't known in, the shard is 
+            # counted again to take the others back
+            known = known_games(shard_hashes, cursor)
+            taken_back = known.union(seen.intersection(shard_hashes))
+            if taken_back:
+                recounts.append(pool.apply_async(count_shard, 
+                                                 (shard, taken_back)))
+            seen.update(game_hash for game_hash in shard_hashes 
+                        if game_hash not in known)
+            db_counts.update(shard_db)
+            book_counts.update(shard_book)
+            plies += shard_plies
+            report(len(seen), plies, 0, time.perf_counter() - start)
+        for recount in recounts:
+            shard_db, shard_book, _, shard_plies = recount.get()
+            db_counts.subtract(shard_db)
+            book_counts.subtract(shard_book)
+            plies -= shard_plies
+    # Drop the counts taken back to zero
+    db_counts = +db_counts
+    book_counts = +book_counts
+    game_hashes = list(seen)
 
-    cnx = mysql.connector.connect(
+    for i in range(0, len(game_hashes), BATCH_ROWS):
+        cursor.executemany(INSERT_GAMES, [(game_hash,) for game_hash in 
+                                          game_hashes[i:i + BATCH_ROWS]])
+    rows = write_counts(db_counts, book_counts, cursor)
+    cnx.commit()
+    report(len(game_hashes), plies, rows, time.perf_counter() - start)
+    return len(game_hashes)
+
+
+def find_shards(pgn_filename, shards):
+    """ Split a pgn file into byte ranges that each start at the beginning 
+    of a game
+    :param str pgn_filename: The name of the pgn file
+    :param int shards: The number of ranges to aim for
+    :return: The start and end offset of each range
+    :rtype: list[tuple(int, int)]
+    """
+    size = os.path.getsize(pgn_filename)
+    starts = [0]
+    with open(pgn_filename, 'rb') as pgn_file:
+        for i in range(1, shards):
+            pgn_file.seek(max(size * i // shards, starts[-1]))
+            pgn_file.readline()
+            while True:
+                offset = pgn_file.tell()
+                line = pgn_file.readline()
+                if not line or line.startswith(GAME_START):
+                    break
+            if line and offset > starts[-1]:
+                starts.append(offset)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def count_shard(shard, only=None):
+    """ Count the opening moves of the games in a byte range of a pgn file.
+    Run in the worker processes of ingest_parallel.
+    :param tuple(str, int, int) shard: The name of the pgn file and the 
+        start and end offset of the range
+    :param set[bytes] or None only: Hashes of the only games to count, 
+        used to take back games already in the database or counted in an 
+        earlier shard
+    :return: The database counts, binary book counts, hashes of the games
+        and number of plies of the games in the range
+    :rtype: tuple(Counter, Counter, list[bytes], int)
+    """
+    pgn_filename, shard_start, shard_end = shard
+    db_counts = Counter()
+    book_counts = Counter()
+    game_hashes = set()
+    plies = 0
+    with open(pgn_filename, 'rb') as pgn_file:
+        pgn_file.seek(shard_start)
+        text = io.TextIOWrapper(
+            io.BufferedReader(ShardReader(pgn_file, shard_end)), 
+            encoding="utf-8", errors="replace")
+        for game_hash, game_plies in read_openings(text):
+            if only is not None and game_hash not in only:
+                continue
+            if game_hash in game_hashes:
+                continue
+            game_hashes.add(game_hash)
+            count_plies(game_plies, db_counts, book_counts)
+            plies += len(game_plies)
+    return db_counts, book_counts, list(game_hashes), plies
+
+
+def connect_db():
+    """ Connect to the openings database 
+    :return: The connection to the database
+    :rtype: mysql.connector.connection.MySQLConnection
+    """
+    return mysql.connector.connect(
         host="localhost",
         user="root",
         passwd="briansql",
         database="chess_openings"
         )
-    cursor = cnx.cursor(buffered=True)
-    convert_to_uci(pgn_filename)
-
-    read_file = open(UCI_FILENAME, 'r')
-    write_file = open("output.txt", 'w')
-
-    i = 0
-    for line in read_file:       
-        if i % 1000 == 0:
-            print(i)
-        i += 1
-        
-        if line[0] != '[' and line[0] != ' ':
-            move_list = get_move_list(line)
-            add_to_database(move_list, cursor)
-            write_file.write(line)
 
-    cnx.commit()
+
+def clear_db():
+    """ Clear the opening database and its manifest """
+    cnx = connect_db()
+    cursor = cnx.cursor(buffered=True)
+    for table in ("moves", "fen", "book", "games", "sources"):
+        cursor.execute(f"DROP TABLE IF EXISTS {table};")
     cursor.close()
     cnx.close()
-
-    write_file.close()
-    read_file.close()
+    create_tables()
 
 
-def clear_db():
-    """ Clear the opening database """
-    cnx = mysql.connector.connect(
-    host="localhost",
-    user="root",
-    passwd="briansql",
-    database="chess_openings"
-    )
-
+def create_tables():
+    """ Create the opening database tables that don't exist yet.  Each row 
+    of the moves table is the number of times a move was played in a 
+    position and the index on (fen, count, name) covers the lookup of the 
+    most played move of a position.  The book table has the exact counts
+    the binary book is written from.  Rows added or changed since the files
+    were last written are marked dirty.  The games and sources tables are 
+    the manifest of what has been ingested.
+    """
+    cnx = connect_db()
     cursor = cnx.cursor(buffered=True)
 
-    clear_call = "\
-    USE chess_openings;\
-    DROP TABLE IF EXISTS moves;\
-    DROP TABLE IF EXISTS fen;\
-    CREATE TABLE fen (\
-    name VARCHAR(72) NOT NULL,\
-    PRIMARY KEY (name)\
-    );\
-    CREATE TABLE moves (\
-    id INT NOT NULL AUTO_INCREMENT,\
-    name VARCHAR(10) NOT NULL,\
-    fen VARCHAR(72) NOT NULL,\
-    PRIMARY KEY (id),\
-    FOREIGN KEY (fen) REFERENCES fen(name)\
-    );\
-    "
-    cursor.execute(clear_call)
+    create_calls = [
+        "CREATE TABLE IF NOT EXISTS moves (\
+        fen VARCHAR(72) NOT NULL,\
+        name VARCHAR(10) NOT NULL,\
+        count INT UNSIGNED NOT NULL,\
+        dirty BOOLEAN NOT NULL DEFAULT 1,\
+        PRIMARY KEY (fen, name),\
+        INDEX fen_count (fen, count DESC, name),\
+        INDEX dirty (dirty)\
+        );",
+        "CREATE TABLE IF NOT EXISTS book (\
+        hash BIGINT UNSIGNED NOT NULL,\
+        move SMALLINT UNSIGNED NOT NULL,\
+        count INT UNSIGNED NOT NULL,\
+        dirty BOOLEAN NOT NULL DEFAULT 1,\
+        PRIMARY KEY (hash, move),\
+        INDEX dirty (dirty)\
+        );",
+        "CREATE TABLE IF NOT EXISTS games (\
+        hash BINARY(16) NOT NULL,\
+        PRIMARY KEY (hash)\
+        );",
+        "CREATE TABLE IF NOT EXISTS sources (\
+        digest CHAR(64) NOT NULL,\
+        name VARCHAR(255) NOT NULL,\
+        games INT UNSIGNED NOT NULL,\
+        ingested TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,\
+        PRIMARY KEY (digest)\
+        );"
+    ]
+    for create_call in create_calls:
+        cursor.execute(create_call)
     cursor.close()
     cnx.close()
 
 
-def convert_to_uci(pgn_filename):
-    """ Convert portable game notation (PGN) to universal chess 
-    interface (UCI) notation and output to UCI_FILENAME
+def source_digest(pgn_filename):
+    """ Compute the SHA-256 digest of a pgn file used to recognize files 
+    that have already been ingested
     :param str pgn_filename: The name of the pgn file
+    :return: The hex digest of the file
+    :rtype: str
     """
-    os.system(f"pgn-extract.exe -Wuci --output {UCI_FILENAME} {pgn_filename}")
+    digest = hashlib.sha256()
+    with open(pgn_filename, 'rb') as pgn_file:
+        for chunk in iter(lambda: pgn_file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
-def get_move_list(game_uci):
-    """ Create and return the move list for the given game 
-    :param str game_uci: The game moves in uci notation
-    :return: The list of the first 20 moves (10 for each side)
-    :rtype: list[str]
+def read_openings(pgn_file):
+    """ Stream the opening plies of each game of a pgn file 
+    :param TextIO pgn_file: The open pgn file
+    :return: Generator of the hash of each game and the (board FEN, UCI 
+        move, position hash, Polyglot move) of its first MAX_PLIES plies
+    :rtype: Generator[tuple(bytes, list[tuple(str, str, int, int)])]
     """
-    move_list = game_uci.split(' ')[:-1]
-    if len(move_list) > 20:
-        move_list = move_list[:20]
-    result_list = []
-    for move in move_list:
-        if move[-1].isalpha():
-            move = move[:-1] + move[-1].lower()
-        result_list.append(move)
-    return result_list
+    while True:
+        game = chess.pgn.read_game(pgn_file, Visitor=OpeningVisitor)
+        if game is None:
+            return
+        yield game
 
 
-def add_to_database(move_list, cursor):
-    """ Store the move made for each board FEN (Forsyth-Edwards Notation) 
-    :param list[str] move_list: The list of moves in uci notation 
-    :param mysql.connector.connect.cursor cursor: The cursor for the openings 
-        database
+def count_plies(game_plies, db_counts, book_counts):
+    """ Count the move made in each position of a game
+    :param list[tuple(str, str, int, int)] game_plies: The opening plies of 
+        the game
+    :param Counter db_counts: Counts of each (board FEN, UCI move) pair for 
+        the database
+    :param Counter book_counts: Counts of each (position hash, Polyglot 
+        move) pair for the binary book
     """
-    board = chess.Board()
-    last_fen = chess.STARTING_BOARD_FEN
-    for move_uci in move_list:
-        cursor.execute(f"INSERT IGNORE INTO fen (name) VALUES ('{last_fen}');")
-        cursor.execute(f"INSERT INTO moves (name, fen) VALUES ('{move_uci}', '{last_fen}');")
-        board.push_uci(move_uci)
-        last_fen = board.board_fen()
+    for fen, move_uci, key, book_move in game_plies:
+        db_counts[(fen, move_uci)] += 1
+        book_counts[(key, book_move)] += 1
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python db_generator.py [pgn file name]")
+def write_counts(db_counts, book_counts, cursor):
+    """ Add move and book counts to the database with multi-row inserts
+    :param Counter db_counts: Counts of each (board FEN, UCI move) pair
+    :param Counter book_counts: Counts of each (position hash, Polyglot 
+        move) pair
+    :param mysql.connector.cursor.MySQLCursor cursor: The cursor for the 
+        openings database
+    :return: The number of rows written
+    :rtype: int
+    """
+    rows = 0
+    for insert, counts in ((INSERT_MOVES, db_counts), 
+                           (INSERT_BOOK, book_counts)):
+        values = [key + (count,) for key, count in counts.items()]
+        for i in range(0, len(values), BATCH_ROWS):
+            cursor.executemany(insert, values[i:i + BATCH_ROWS])
+        rows += len(values)
+    return rows
+
+
+def report(games, plies, rows, elapsed):
+    """ Print the progress of the ingestion 
+    :param int games: Games read so far
+    :param int plies: Plies read so far
+    :param int rows: Rows written so far
+    :param float elapsed: Seconds since the ingestion started
+    """
+    elapsed = max(elapsed, 1e-9)
+    print(f"{games} games, {plies} plies ({plies / elapsed:.0f}/s), "
+          f"{rows} rows ({rows / elapsed:.0f}/s)")
+
+
+def polyglot_move(board, move):
+    """ Encode a move in the Polyglot format where castling is written as 
+    the king capturing its own rook
+    :param chess.Board board: The board the move is made on
+    :param chess.Move move: The move to encode
+    :return: The encoded move
+    :rtype: int
+    """
+    to_square = move.to_square
+    if board.is_castling(move) and not board.chess960:
+        rook_file = 7 if chess.square_file(to_square) == 6 else 0
+        to_square = chess.square(rook_file, chess.square_rank(to_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | move.from_square << 6 | promotion << 12
+
+
+def read_book_counts(cursor):
+    """ Read the exact counts of the book's moves in the dirty positions 
+    from the database
+    :param mysql.connector.cursor.MySQLCursor cursor: The cursor for the 
+        openings database
+    :return: Counts of each (position hash, Polyglot move) pair of the 
+        positions with a dirty move
+    :rtype: Counter
+    """
+    cursor.execute("SELECT DISTINCT hash FROM book WHERE dirty = 1")
+    keys = [row[0] for row in cursor.fetchall()]
+    book_counts = Counter()
+    for i in range(0, len(keys), BATCH_ROWS):
+        batch = keys[i:i + BATCH_ROWS]
+        placeholders = ", ".join(["%s"] * len(batch))
+        cursor.execute(f"SELECT hash, move, count FROM book WHERE hash IN "
+                       f"({placeholders})", batch)
+        for key, move, count in cursor.fetchall():
+            book_counts[(int(key), int(move))] = int(count)
+    return book_counts
+
+
+def read_book(book_filename, skipped):
+    """ Stream the entries of a binary openings book
+    :param str book_filename: The name of the book file
+    :param set[int] skipped: Hashes of the positions to leave out
+    :return: Generator of the entries of the other positions in the order 
+        of the file
+    :rtype: Generator[tuple(int, int, int, int)]
+    """
+    if not os.path.exists(book_filename):
+        return
+    with open(book_filename, 'rb') as book_file:
+        for chunk in iter(lambda: book_file.read(BOOK_ENTRY.size * 
+                                                 BATCH_ROWS), b""):
+            for entry in BOOK_ENTRY.iter_unpack(chunk):
+                if entry[0] not in skipped:
+                    yield entry
+
+
+def write_book(book_counts, book_filename, merge=False):
+    """ Write the binary openings book sorted by position hash, with the 
+    most played move of each position first.  Weights are the number of 
+    times each move was played, scaled down for positions where a count is 
+    too large to store.
+    :param Counter book_counts: Counts of each (position hash, Polyglot 
+        move) pair of the positions to write
+    :param str book_filename: The name of the book file
+    :param bool merge: True to keep the other positions of the existing 
+        book, False to replace it
+    """
+    positions = {}
+    for (key, move), count in book_counts.items():
+        positions.setdefault(key, []).append((count, move))
+
+    entries = []
+    for key in sorted(positions):
+        moves = sorted(positions[key], reverse=True)
+        top = moves[0][0]
+        for count, move in moves:
+            if top > MAX_WEIGHT:
+                count = max(1, count * MAX_WEIGHT // top)
+            entries.append((key, move, count, 0))
+    old_entries = read_book(book_filename, positions) if merge else ()
+
+    tmp_filename = book_filename + ".tmp"
+    with open(tmp_filename, 'wb') as book_file:
+        # The positions of the two are disjoint, so entries of a position 
+        # stay together in their order
+        for entry in heapq.merge(old_entries, entries, 
+                                 key=lambda entry: entry[0]):
+            book_file.write(BOOK_ENTRY.pack(*entry))
+    os.replace(tmp_filename, book_filename)
+
+
+def export_sqlite(cursor, sqlite_filename, merge=False):
+    """ Copy the dirty rows of the moves table of the openings database to 
+    an SQLite file with the same schema
+    :param mysql.connector.cursor.MySQLCursor cursor: The cursor for the 
+        openings database
+    :param str sqlite_filename: The name of the SQLite file
+    :param bool merge: True to update the rows of the existing file, False 
+        to replace it
+    """
+    if merge and os.path.exists(sqlite_filename):
+        lite_filename = sqlite_filename
     else:
-        main(sys.argv[1])
+        lite_filename = sqlite_filename + ".tmp"
+        if os.path.exists(lite_filename):
+            os.remove(lite_filename)
+    lite = sqlite3.connect(lite_filename)
+    lite.execute("CREATE TABLE IF NOT EXISTS moves (\
+        fen VARCHAR(72) NOT NULL,\
+        name VARCHAR(10) NOT NULL,\
+        count INT UNSIGNED NOT NULL,\
+        PRIMARY KEY (fen, name)\
+        );")
+    lite.execute("CREATE INDEX IF NOT EXISTS fen_count ON moves "
+                 "(fen, count DESC, name);")
+
+    cursor.execute("SELECT fen, name, count FROM moves WHERE dirty = 1")
+    while True:
+        rows = cursor.fetchmany(BATCH_ROWS)
+        if not rows:
+            break
+        lite.executemany("INSERT OR REPLACE INTO moves VALUES (?, ?, ?)", 
+                         rows)
+    lite.commit()
+    lite.close()
+    if lite_filename != sqlite_filename:
+        os.replace(lite_filename, sqlite_filename)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create the openings database from a pgn file")
+    parser.add_argument("pgn_filename", help="pgn file name")
+    parser.add_argument("workers", nargs="?", type=int, default=1, 
+                        help="number of processes to read the file with")
+    parser.add_argument("--incremental", action="store_true", 
+                        help="add the games to the existing database and "
+                             "book instead of rebuilding them")
+    args = parser.parse_args()
+    main(args.pgn_filename, args.workers, args.incremental)
@@ -0,0 +1,103 @@
+""" File: scheduler.py
+This file contains the FrameScheduler class which runs the application's
+loops.  It blocks on the event queue while nothing is happening, merges
+bursts of mouse motion into one event per frame and caps the frame rate.
+It also measures the latency from input to paint and how much of the time
+the application was idle.
+"""
+import pygame
+import time
+
+
+FRAME_RATE = 60         # Most frames drawn per second
+POLL_MS = 20            # Event wait while something needs polling
+
+# Events of which only the last of a burst is kept
+COALESCED_EVENTS = (pygame.MOUSEMOTION, pygame.VIDEORESIZE)
+
+# Events whose latency to the next frame is measured
+INPUT_EVENTS = {pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, 
+                pygame.MOUSEBUTTONUP, pygame.KEYDOWN, pygame.KEYUP}
+
+
+class FrameScheduler:
+    def __init__(self, frame_rate=FRAME_RATE):
+        """ Creates the scheduler
+        :param int frame_rate: Most frames drawn per second
+        """
+        self.frame_rate = frame_rate
+        self.clock = pygame.time.Clock()
+        self.frames = 0
+        self.coalesced = 0
+        self.latencies = []
+        self.idle_time = 0.0
+        self._input_time = None
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def events(self, poll=False):
+        """ Waits for events and returns every queued event.  Mouse motion
+        and window resize events are merged so only the last of each is 
+        returned.
+        :param bool poll: True to stop waiting after POLL_MS, for when
+            something besides events needs checking
+        :return: The events in the order they happened
+        :rtype: list[pygame.event.Event]
+        """
+        start = time.perf_counter()
+        if poll:
+            first = pygame.event.wait(POLL_MS)
+        else:
+            first = pygame.event.wait()
+        now = time.perf_counter()
+        self.idle_time += now - start
+
+        events = pygame.event.get()
+        if first.type != pygame.NOEVENT:
+            events.insert(0, first)
+        for event_type in COALESCED_EVENTS:
+            bursts = [event for event in events if event.type == event_type]
+            if len(bursts) > 1:
+                self.coalesced += len(bursts) - 1
+                last = bursts[-1]
+                events = [event for event in events
+                          if event.type != event_type or event is last]
+        if self._input_time is None and any(
+            event.type in INPUT_EVENTS for event in events):
+            self._input_time = now
+        return events
+
+    def frame(self, render):
+        """ Draws a frame, waiting first if the last frame was drawn less
+        than a frame ago
+        :param function render: Draws the frame
+        """
+        self.clock.tick(self.frame_rate)
+        render()
+        self.frames += 1
+        if self._input_time is not None:
+            self.latencies.append(time.perf_counter() - self._input_time)
+            self._input_time = None
+
+    def report(self):
+        """ Returns the frame statistics since the scheduler was created
+        :return: The frames drawn, events merged, input to paint
+            latency in milliseconds and the idle and CPU share of the time
+        :rtype: dict
+        """
+        elapsed = time.perf_counter() - self._start
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "frames": self.frames,
+            "coalesced_events": self.coalesced,
+            "latency_mean_ms": (1000 * sum(latencies) / count
+                                if count else 0.0),
+            "latency_p95_ms": (1000 * latencies[min(count - 1,
+                                                    int(0.95 * count))]
+                               if count else 0.0),
+            "latency_max_ms": 1000 * latencies[-1] if count else 0.0,
+            "idle_share": self.idle_time / elapsed if elapsed else 0.0,
+            "cpu_share": ((time.process_time() - self._cpu_start) / elapsed
+                          if elapsed else 0.0)
+        }
@@ -0,0 +1,166 @@
+""" File: search_cache.py
+This file contains the SearchCache class which keeps search results of
+positions near the root in an SQLite file so that later games and other
+processes can reuse them.  The file is in write-ahead logging mode, which
+lets any number of processes read while one writes.
+"""
+import os
+import sqlite3
+import threading
+from transposition import decode_move, encode_move
+
+
+# Search cache file shared by every game
+CACHE_FILENAME = "res/search_cache.db"
+
+# Seconds a write waits for another process to finish writing
+BUSY_TIMEOUT = 5.0
+
+CREATE_TABLE = ("CREATE TABLE IF NOT EXISTS positions ("
+                "key INTEGER PRIMARY KEY, "
+                "depth INTEGER NOT NULL, "
+                "score INTEGER NOT NULL, "
+                "bound INTEGER NOT NULL, "
+                "move INTEGER NOT NULL)")
+PROBE_QUERY = "SELECT depth, score, bound, move FROM positions WHERE key = ?"
+STORE_QUERY = ("INSERT INTO positions (key, depth, score, bound, move) "
+               "VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+               "depth = excluded.depth, score = excluded.score, "
+               "bound = excluded.bound, move = excluded.move "
+               "WHERE excluded.depth > positions.depth")
+
+# Shared instance of each cache file
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _signed(key):
+    """ Converts a 64-bit Zobrist hash to the signed integer range SQLite
+    stores
+    :param int key: The Zobrist hash
+    :return: The hash as a signed 64-bit integer
+    :rtype: int
+    """
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class SearchCache:
+    def __init__(self, filename=CACHE_FILENAME):
+        """ Creates a cache backed by the given file, which is opened on
+        first use
+        :param str filename: The name of the SQLite file
+        """
+        self.filename = filename
+        self.db = None
+        self.disabled = False
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """ Opens the cache file, creating it if it doesn't exist.  If it
+        can't be opened the cache is disabled and searches run without it.
+        :return: True if the file is open
+        :rtype: bool
+        """
+        if self.db is None and not self.disabled:
+            try:
+                directory = os.path.dirname(self.filename)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.db = sqlite3.connect(self.filename, 
+                                          timeout=BUSY_TIMEOUT,
+                                          check_same_thread=False)
+                self.db.execute("PRAGMA journal_mode=WAL")
+                self.db.execute("PRAGMA synchronous=NORMAL")
+                self.db.execute(CREATE_TABLE)
+                self.db.commit()
+            except (OSError, sqlite3.Error):
+                if self.db is not None:
+                    self.db.close()
+                    self.db = None
+                self.disabled = True
+                self.pending.clear()
+        return self.db is not None
+
+    def probe(self, key):
+        """ Returns the result stored for the given position, including
+        results stored since the last flush
+        :param int key: The Zobrist hash of the position
+        :return: The entry (key, depth, score, bound, move) or None if the
+            position is not stored
+        :rtype: tuple or None
+        """
+        with self._lock:
+            entry = self.pending.get(key)
+            if entry is not None:
+                return entry
+            if not self._connect():
+                return None
+            row = self.db.execute(PROBE_QUERY, (_signed(key),)).fetchone()
+        if row is None:
+            return None
+        depth, score, bound, move = row
+        return key, depth, score, bound, decode_move(move)
+
+    def store(self, key, depth, score, bound, move):
+        """ Stores a search result to be written by the next flush.  A
+        result only replaces one searched less deep, and nothing is stored
+        once the cache is disabled.
+        :param int key: The Zobrist hash of the position
+        :param int depth: The depth the position was searched to
+        :param int score: The evaluation of the position
+        :param int bound: EXACT, LOWER or UPPER
+        :param chess.Move or None move: The best move found
+        """
+        with self._lock:
+            if self.disabled:
+                return
+            entry = self.pending.get(key)
+            if entry is None or depth >= entry[1]:
+                self.pending[key] = (key, depth, score, bound, move)
+
+    def flush(self):
+        """ Writes the stored results to the file in one transaction """
+        with self._lock:
+            if not self.pending:
+                return
+            rows = [(_signed(key), depth, score, bound, encode_move(move))
+                    for key, depth, score, bound, move in
+                    self.pending.values()]
+            self.pending.clear()
+            if not self._connect():
+                return
+            try:
+                with self.db:
+                    self.db.executemany(STORE_QUERY, rows)
+            except sqlite3.OperationalError:
+                # A locked or read-only file loses these results, later 
+                # searches run without them
+                pass
+
+    def close(self):
+        """ Writes the stored results and closes the file """
+        self.flush()
+        with self._lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+def get_cache(filename=CACHE_FILENAME):
+    """ Returns the shared cache of a file
+    :param str filename: The name of the SQLite file
+    :return: The search cache
+    :rtype: SearchCache
+    """
+    with _caches_lock:
+        if filename not in _caches:
+            _caches[filename] = SearchCache(filename)
+        return _caches[filename]
+
+
+def close_caches():
+    """ Writes and closes every shared search cache """
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.close()
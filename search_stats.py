@@ -0,0 +1,202 @@
+""" File: search_stats.py
+This file contains the SearchStats class which counts what a search does and
+times where it spends its time.  The counting and timing wrappers are bound
+onto the search game's objects only while a search with stats runs, so a
+search without stats runs the unwrapped methods.
+"""
+from collections import namedtuple
+import time
+
+
+# Result of one completed iteration of iterative deepening, nodes and time 
+# are totals since the search started
+Iteration = namedtuple('Iteration', ['depth', 'score', 'move', 'nodes',
+                                     'qnodes', 'time', 'pv'])
+
+# Parts of the search that are timed
+TIMERS = ("move_generation", "make_move", "outcome", "evaluation")
+
+
+class SearchStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ Clears the counters and timers for a new search """
+        self.nodes = 0
+        self.qnodes = 0
+        self.interior_nodes = 0
+        self.moves_searched = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.iterations = []
+        self.times = dict.fromkeys(TIMERS, 0.0)
+        self._move_counts = []
+
+    def attach(self, game):
+        """ Resets the stats and wraps the methods of the game, its board,
+        evaluator, move orderer and transposition table that are counted or
+        timed
+        :param AIGame game: The game about to be searched
+        """
+        self.reset()
+        self._wrapped = []
+        self._wrap(game, "make_move", self._timed("make_move",
+                                                  game.make_move))
+        self._wrap(game, "unmake_move", self._timed("make_move",
+                                                    game.unmake_move))
+        self._wrap(game.board, "outcome", self._timed("outcome",
+                                                      game.board.outcome))
+        self._wrap(game.evaluator, "evaluate",
+                   self._timed("evaluation", game.evaluator.evaluate))
+        self._wrap(game.orderer, "moves", self._counted_moves(
+            game.orderer.moves))
+        self._wrap(game.orderer, "cutoff", self._counted_cutoff(
+            game.orderer.cutoff))
+        self._wrap(game.tt, "probe", self._counted_probe(game.tt.probe))
+
+    def detach(self, game):
+        """ Removes the wrappers added by attach and records the node counts
+        of the search
+        :param AIGame game: The game that was searched
+        """
+        for obj, name in self._wrapped:
+            delattr(obj, name)
+        self._wrapped = []
+        self.nodes = game.nodes
+        self.qnodes = game.qnodes
+
+    def iteration(self, iteration):
+        """ Records a completed iteration
+        :param Iteration iteration: The iteration
+        """
+        self.iterations.append(iteration)
+
+    def _wrap(self, obj, name, wrapper):
+        """ Binds a wrapper over a method on one object
+        :param object obj: The object whose method is wrapped
+        :param str name: The name of the method
+        :param function wrapper: The wrapper to call instead
+        """
+        setattr(obj, name, wrapper)
+        self._wrapped.append((obj, name))
+
+    def _timed(self, timer, method):
+        """ Returns a wrapper of a method that adds its time to a timer
+        :param str timer: The timer to add to
+        :param function method: The method to time
+        :rtype: function
+        """
+        times = self.times
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                times[timer] += perf_counter() - start
+        return timed
+
+    def _counted_moves(self, moves):
+        """ Returns a wrapper of MoveOrderer.moves that times generating the
+        moves and counts the moves searched at each node
+        :param function moves: The move generator to wrap
+        :rtype: function
+        """
+        times = self.times
+        perf_counter = time.perf_counter
+        move_counts = self._move_counts
+
+        def counted(*args):
+            self.interior_nodes += 1
+            generator = moves(*args)
+            move_counts.append(0)
+            try:
+                while True:
+                    start = perf_counter()
+                    try:
+                        move = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        times["move_generation"] += perf_counter() - start
+                    move_counts[-1] += 1
+                    self.moves_searched += 1
+                    yield move
+            finally:
+                move_counts.pop()
+        return counted
+
+    def _counted_cutoff(self, cutoff):
+        """ Returns a wrapper of MoveOrderer.cutoff that counts beta cutoffs
+        and those caused by the first move searched
+        :param function cutoff: The cutoff method to wrap
+        :rtype: function
+        """
+        def counted(*args):
+            self.cutoffs += 1
+            if self._move_counts and self._move_counts[-1] == 1:
+                self.first_move_cutoffs += 1
+            return cutoff(*args)
+        return counted
+
+    def _counted_probe(self, probe):
+        """ Returns a wrapper of TranspositionTable.probe that counts probes
+        and hits
+        :param function probe: The probe method to wrap
+        :rtype: function
+        """
+        def counted(key):
+            self.tt_probes += 1
+            entry = probe(key)
+            if entry is not None:
+                self.tt_hits += 1
+            return entry
+        return counted
+
+    def iteration_deltas(self):
+        """ Returns the nodes searched and time taken by each iteration,
+        iterations only record the totals since the search started
+        :rtype: list[tuple(int, float)]
+        """
+        deltas = []
+        last_nodes, last_time = 0, 0.0
+        for iteration in self.iterations:
+            nodes = iteration.nodes + iteration.qnodes
+            deltas.append((nodes - last_nodes, iteration.time - last_time))
+            last_nodes, last_time = nodes, iteration.time
+        return deltas
+
+    def branching_factors(self):
+        """ Returns the effective branching factor of each iteration after
+        the first, the nodes it searched over the nodes of the one before
+        :rtype: list[float]
+        """
+        deltas = self.iteration_deltas()
+        return [nodes / last_nodes if last_nodes else 0.0 for (last_nodes, _),
+                (nodes, _) in zip(deltas, deltas[1:])]
+
+    def as_dict(self):
+        """ Returns the stats of the last search
+        :rtype: dict
+        """
+        return {
+            "nodes": self.nodes,
+            "qnodes": self.qnodes,
+            "moves_per_node": (self.moves_searched / self.interior_nodes
+                               if self.interior_nodes else 0.0),
+            "cutoffs": self.cutoffs,
+            "cutoff_rate": (self.cutoffs / self.interior_nodes
+                            if self.interior_nodes else 0.0),
+            "first_move_cutoff_rate": (self.first_move_cutoffs / self.cutoffs
+                                       if self.cutoffs else 0.0),
+            "tt_hit_rate": (self.tt_hits / self.tt_probes
+                            if self.tt_probes else 0.0),
+            "branching_factors": self.branching_factors(),
+            "iteration_times": [iteration_time for _, iteration_time in
+                                self.iteration_deltas()],
+            "times": dict(self.times)
+        }
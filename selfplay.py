@@ -0,0 +1,378 @@
+""" File: selfplay.py
+This file contains the headless self-play harness.  It plays AIGame against
+itself, or two configurations of AIGame against each other, from a set of
+start positions in parallel processes and writes the per-move search
+statistics and the match result with its Elo difference as JSON.  With
+--speedup it instead measures how much faster engine A's worker processes
+reach a depth than the same engine searching in one process.
+
+Usage: python selfplay.py [--games N] [--processes N] [--time-limit S]
+                          [--node-limit N] [--engine-a JSON]
+                          [--engine-b JSON] [--positions FILE]
+                          [--max-plies N] [--speedup DEPTH] [--output FILE]
+"""
+from ai_game import AIGame
+import argparse
+import chess
+from concurrent.futures import ProcessPoolExecutor
+import json
+import math
+import multiprocessing
+import statistics
+import sys
+import time
+
+
+# Start positions used when no positions file is given
+START_POSITIONS = [
+    chess.STARTING_FEN,
+    # Ruy Lopez
+    "r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+    # Sicilian Defence
+    "rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2",
+    # Queen's Gambit Declined
+    "rnbqkbnr/ppp2ppp/4p3/3p4/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 3",
+    # French Defence
+    "rnbqkbnr/ppp2ppp/4p3/3p4/3PP3/8/PPP2PPP/RNBQKBNR w KQkq - 0 3",
+    # Caro-Kann Defence
+    "rnbqkbnr/pp2pppp/2p5/3p4/3PP3/8/PPP2PPP/RNBQKBNR w KQkq - 0 3",
+    # King's Indian Defence
+    "rnbqkb1r/pppppp1p/5np1/8/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 3",
+    # Italian Game
+    "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+]
+
+MAX_PLIES = 200         # Plies after which a game is adjudicated a draw
+Z_95 = 1.96             # Standard scores of a 95% confidence interval
+
+# Default AIGame settings of both engines
+ENGINE_DEFAULTS = {"opening_book": False, "time_limit": None}
+
+
+def main():
+    """ Parse the command line, play the match and write the report """
+    parser = argparse.ArgumentParser(
+        description="Play AIGame against itself headlessly")
+    parser.add_argument("--games", type=int, default=16,
+                        help="number of games, each position is played "
+                             "with both colors")
+    parser.add_argument("--processes", type=int,
+                        default=multiprocessing.cpu_count(),
+                        help="number of games played at once")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="seconds each engine may think per move")
+    parser.add_argument("--node-limit", type=int, default=None,
+                        help="nodes each engine may search per move, "
+                             "20000 when neither limit is given")
+    parser.add_argument("--engine-a", type=json.loads, default={},
+                        help="JSON object of AIGame arguments of engine A")
+    parser.add_argument("--engine-b", type=json.loads, default={},
+                        help="JSON object of AIGame arguments of engine B")
+    parser.add_argument("--positions",
+                        help="file of start positions, one FEN or EPD per "
+                             "line")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES,
+                        help="plies after which a game is a draw")
+    parser.add_argument("--speedup", type=int, metavar="DEPTH",
+                        help="measure the time to DEPTH of engine A's "
+                             "workers against one process instead of "
+                             "playing a match")
+    parser.add_argument("--output", help="JSON report file, printed when "
+                                         "not given")
+    args = parser.parse_args()
+
+    if args.time_limit is None and args.node_limit is None:
+        args.node_limit = 20000
+    base = dict(ENGINE_DEFAULTS, time_limit=args.time_limit,
+                node_limit=args.node_limit)
+    engines = {"A": dict(base, **args.engine_a),
+               "B": dict(base, **args.engine_b)}
+    positions = START_POSITIONS
+    if args.positions:
+        positions = read_positions(args.positions)
+
+    if args.speedup:
+        if engines["A"].get("workers", 1) < 2:
+            parser.error("--speedup needs engine A to have workers, e.g. "
+                         "--engine-a '{\"workers\": 4}'")
+        report = measure_speedup(engines["A"], positions, args.speedup)
+    else:
+        report = run_match(engines, positions, args.games, args.processes,
+                           args.max_plies)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+    summary = report["summary"]
+    if args.speedup:
+        print(f"{engines['A']['workers']} workers: {summary['speedup']}x "
+              f"time to depth {args.speedup}", file=sys.stderr)
+        return
+    print(f"A vs B: +{summary['wins']} ={summary['draws']} "
+          f"-{summary['losses']}, Elo {summary['elo']} "
+          f"+/- {summary['elo_error']}", file=sys.stderr)
+
+
+def read_positions(positions_filename):
+    """ Read the start positions of a file of FENs or EPDs
+    :param str positions_filename: The name of the positions file
+    :return: The FEN of each position
+    :rtype: list[str]
+    """
+    positions = []
+    with open(positions_filename) as positions_file:
+        for line in positions_file:
+            fields = line.split()
+            if len(fields) < 4 or line.startswith("#"):
+                continue
+            if len(fields) < 6 or not fields[4].isdigit():
+                fields = fields[:4] + ["0", "1"]
+            positions.append(" ".join(fields[:6]))
+    return positions
+
+
+def run_match(engines, positions, games, processes, max_plies):
+    """ Play the games of a match in a process pool.  Its processes 
+    aren't daemons, so engines with workers can start their own.
+    :param dict engines: The AIGame arguments of engines A and B
+    :param list[str] positions: The FEN of each start position
+    :param int games: The number of games
+    :param int processes: The number of games played at once
+    :param int max_plies: Plies after which a game is a draw
+    :return: The report of the match
+    :rtype: dict
+    """
+    tasks = []
+    for index in range(games):
+        fen = positions[index // 2 % len(positions)]
+        white = "A" if index % 2 == 0 else "B"
+        tasks.append((index, fen, white, engines, max_plies))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max(1, processes)) as executor:
+        results = list(executor.map(play_game, tasks))
+    return {
+        "engines": engines,
+        "games": results,
+        "summary": summarize(results, time.perf_counter() - start)
+    }
+
+
+def measure_speedup(engine, positions, depth):
+    """ Measure the speedup in time to depth of an engine's worker 
+    processes.  Each position is searched to the depth by the engine and by
+    the same engine in one process, both starting from an empty table.
+    :param dict engine: The AIGame arguments of the engine with workers
+    :param list[str] positions: The FEN of each position
+    :param int depth: The depth each position is searched to
+    :return: The times and nodes of each position and the speedup
+    :rtype: dict
+    """
+    serial = AIGame(**dict(engine, workers=1))
+    parallel = AIGame(**engine)
+    results = []
+    try:
+        # The worker processes are started before anything is timed
+        parallel.search(max_depth=2)
+        for fen in positions:
+            result = {"fen": fen}
+            for name, game in (("serial", serial), ("parallel", parallel)):
+                game.board = chess.Board(fen)
+                game.tt.clear()
+                search = game.search(None, None, depth)
+                result[name] = {"time": round(search.time, 6),
+                                "nodes": search.nodes + search.qnodes,
+                                "depth": search.depth}
+            result["speedup"] = round(result["serial"]["time"] / 
+                                      result["parallel"]["time"], 3)
+            results.append(result)
+    finally:
+        serial.close()
+        parallel.close()
+
+    serial_time = sum(result["serial"]["time"] for result in results)
+    parallel_time = sum(result["parallel"]["time"] for result in results)
+    return {
+        "engine": engine,
+        "depth": depth,
+        "positions": results,
+        "summary": {"serial_time": round(serial_time, 3),
+                    "parallel_time": round(parallel_time, 3),
+                    "speedup": round(serial_time / parallel_time, 3)}
+    }
+
+
+def play_game(task):
+    """ Play one game between engines A and B.  Run in the pool processes
+    of run_match.
+    :param tuple task: The index of the game, start FEN, engine playing
+        white, AIGame arguments of the engines and maximum plies
+    :return: The moves with their search statistics and the result of the
+        game for engine A
+    :rtype: dict
+    """
+    index, fen, white, engines, max_plies = task
+    board = chess.Board(fen)
+    moves = []
+    outcome = board.outcome(claim_draw=True)
+    players = {}
+    try:
+        for name, config in engines.items():
+            players[name] = AIGame(**config)
+        while outcome is None and len(moves) < max_plies:
+            name = white if board.turn == chess.WHITE else other(white)
+            player = players[name]
+            player.board = board.copy()
+            player.last_search = None
+            move_start = time.perf_counter()
+            move = player.get_ai_move()
+            latency = time.perf_counter() - move_start
+            moves.append(move_stats(name, board, move, latency,
+                                    player.last_search))
+            board.push(move)
+            outcome = board.outcome(claim_draw=True)
+    finally:
+        # The players' worker processes and shared tables are released 
+        # even if a game fails
+        for player in players.values():
+            player.close()
+
+    if outcome is None:
+        result, termination = "1/2-1/2", "max_plies"
+    else:
+        result, termination = outcome.result(), outcome.termination.name
+    score = {"1-0": 1.0, "0-1": 0.0}.get(result, 0.5)
+    if white == "B":
+        score = 1.0 - score
+    return {
+        "index": index,
+        "fen": fen,
+        "white": white,
+        "result": result,
+        "termination": termination.lower(),
+        "score": score,
+        "plies": len(moves),
+        "moves": moves
+    }
+
+
+def other(name):
+    """ Returns the other engine of the match
+    :param str name: "A" or "B"
+    :rtype: str
+    """
+    return "B" if name == "A" else "A"
+
+
+def move_stats(name, board, move, latency, search):
+    """ Collect the statistics of one engine move
+    :param str name: The engine that made the move
+    :param chess.Board board: The position before the move
+    :param chess.Move move: The move made
+    :param float latency: Seconds taken to choose the move
+    :param SearchResult or None search: The search that chose the move,
+        None for book moves
+    :return: The statistics of the move
+    :rtype: dict
+    """
+    stats = {
+        "engine": name,
+        "ply": board.ply(),
+        "move": move.uci(),
+        "latency": round(latency, 6),
+        "book": search is None
+    }
+    if search is not None:
+        nodes = search.nodes + search.qnodes
+        stats.update(nodes=nodes, qnodes=search.qnodes, depth=search.depth,
+                     score=search.score,
+                     nps=round(nodes / search.time) if search.time else 0)
+    return stats
+
+
+def summarize(games, elapsed):
+    """ Summarize the speed of each engine and the result of the match
+    :param list[dict] games: The games played
+    :param float elapsed: Seconds the match took
+    :return: The summary of the match
+    :rtype: dict
+    """
+    summary = {"elapsed": round(elapsed, 3), "engines": {}}
+    for name in ("A", "B"):
+        searched = [move for game in games for move in game["moves"]
+                    if move["engine"] == name and not move["book"]]
+        latencies = sorted(move["latency"] for move in searched)
+        total_time = sum(latencies)
+        total_nodes = sum(move["nodes"] for move in searched)
+        summary["engines"][name] = {
+            "moves": len(searched),
+            "latency_mean": round(statistics.fmean(latencies), 6)
+                if latencies else 0,
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p95": percentile(latencies, 0.95),
+            "latency_max": latencies[-1] if latencies else 0,
+            "nodes": total_nodes,
+            "nps": round(total_nodes / total_time) if total_time else 0,
+            "depth_mean": round(statistics.fmean(
+                move["depth"] for move in searched), 2) if searched else 0
+        }
+
+    scores = [game["score"] for game in games]
+    summary["wins"] = scores.count(1.0)
+    summary["draws"] = scores.count(0.5)
+    summary["losses"] = scores.count(0.0)
+    summary.update(elo_interval(scores))
+    return summary
+
+
+def percentile(values, fraction):
+    """ Returns the nearest rank percentile of sorted values
+    :param list[float] values: The sorted values
+    :param float fraction: The percentile as a fraction
+    :rtype: float
+    """
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def elo_interval(scores):
+    """ Estimate the Elo difference of engine A over engine B and its 95%
+    confidence interval from the game scores
+    :param list[float] scores: Engine A's score of each game
+    :return: The score, Elo difference and the half width of its interval
+        along with the interval's bounds
+    :rtype: dict
+    """
+    if not scores:
+        return {"score": None, "elo": None, "elo_error": None,
+                "elo_low": None, "elo_high": None}
+    mean = statistics.fmean(scores)
+    deviation = statistics.pstdev(scores) / math.sqrt(len(scores))
+    elo = elo_difference(mean)
+    low = elo_difference(mean - Z_95 * deviation)
+    high = elo_difference(mean + Z_95 * deviation)
+    return {
+        "score": round(mean, 4),
+        "elo": elo,
+        "elo_error": round((high - low) / 2, 1),
+        "elo_low": low,
+        "elo_high": high
+    }
+
+
+def elo_difference(score):
+    """ Convert an expected score to an Elo difference, scores of 0 and 1
+    are clamped so the difference is finite
+    :param float score: The expected score
+    :return: The Elo difference
+    :rtype: float
+    """
+    score = min(max(score, 0.001), 0.999)
+    return round(-400 * math.log10(1 / score - 1), 1) + 0.0
+
+
+if __name__ == "__main__":
+    main()
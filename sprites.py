@@ -0,0 +1,60 @@
+""" File: sprites.py
+This file contains the piece sprites shared by every GUI in the process.
+Each piece image is decoded once, converted to the display's pixel format
+and scaled to any square size on demand.  The sprites of each size are
+packed side by side into one atlas surface and kept for later boards of the
+same size.
+"""
+import pygame
+
+
+SOURCE_DIR = "res/img/100"     # Largest pre-rendered piece images
+SOURCE_SIZE = 100              # Size of the source images in pixels
+PIECE_CHARS = "PNBRQKpnbrqk"
+
+# Source image of each piece and the sprites of each size
+_sources = None
+_atlases = {}
+
+
+def _load_sources():
+    """ Decodes each piece image and converts it to the display format, the
+    display mode must be set
+    :return: The source image of each piece
+    :rtype: dict{str: pygame.Surface}
+    """
+    global _sources
+    if _sources is None:
+        _sources = {}
+        for char in PIECE_CHARS:
+            color = "w" if char.isupper() else "b"
+            image = pygame.image.load(f"{SOURCE_DIR}/{color}{char.lower()}.png")
+            _sources[char] = image.convert_alpha()
+    return _sources
+
+
+def get_sprites(size):
+    """ Returns the sprite of each piece at the given square size.  The
+    first request for a size scales the source images into an atlas, later
+    requests reuse it.
+    :param int size: The square size in pixels
+    :return: The sprite of each piece, keyed by its FEN character
+    :rtype: dict{str: pygame.Surface}
+    """
+    sprites = _atlases.get(size)
+    if sprites is not None:
+        return sprites
+
+    sources = _load_sources()
+    atlas = pygame.Surface((size * len(PIECE_CHARS), size), pygame.SRCALPHA)
+    atlas = atlas.convert_alpha()
+    atlas.fill((0, 0, 0, 0))
+    sprites = {}
+    for i, char in enumerate(PIECE_CHARS):
+        image = sources[char]
+        if size != SOURCE_SIZE:
+            image = pygame.transform.smoothscale(image, (size, size))
+        atlas.blit(image, (i * size, 0), special_flags=pygame.BLEND_RGBA_MAX)
+        sprites[char] = atlas.subsurface((i * size, 0, size, size))
+    _atlases[size] = sprites
+    return sprites
@@ -0,0 +1,110 @@
+""" File: test_uci.py
+This file contains tests of the UCI engine run as a subprocess with its
+commands written to a pipe, the way chess GUIs run it.
+"""
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPLY_TIMEOUT = 30      # Seconds to wait for a reply before failing
+
+
+class UCIProcess:
+    def __init__(self):
+        """ Starts uci.py with pipes for its stdin and stdout """
+        self.process = subprocess.Popen(
+            [sys.executable, "uci.py"], cwd=ROOT, stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        self.lines = queue.Queue()
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.lines.put(line.strip())
+
+    def send(self, command):
+        """ Writes a command to the engine
+        :param str command: The command
+        """
+        self.process.stdin.write(command + "\n")
+        self.process.stdin.flush()
+
+    def expect(self, prefix):
+        """ Returns the replies up to and including the first one starting
+        with the prefix
+        :param str prefix: The start of the reply to wait for
+        :return: The replies
+        :rtype: list[str]
+        """
+        deadline = time.monotonic() + REPLY_TIMEOUT
+        replies = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AssertionError(f"no {prefix!r} reply in {replies}")
+            try:
+                line = self.lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            replies.append(line)
+            if line.startswith(prefix):
+                return replies
+
+    def quit(self):
+        """ Sends quit and waits for the engine to exit
+        :return: The exit code of the engine
+        :rtype: int
+        """
+        self.send("quit")
+        self.process.stdin.close()
+        return self.process.wait(REPLY_TIMEOUT)
+
+
+class TestUCI(unittest.TestCase):
+    def test_go_with_threads(self):
+        engine = UCIProcess()
+        try:
+            engine.send("uci")
+            engine.expect("uciok")
+            engine.send("setoption name Threads value 2")
+            engine.send("isready")
+            engine.expect("readyok")
+            engine.send("position startpos moves e2e4 e7e5")
+            for _ in range(2):
+                engine.send("go movetime 600")
+                replies = engine.expect("bestmove")
+                depths = [int(line.split()[2]) for line in replies
+                          if line.startswith("info depth")]
+                self.assertTrue(depths and max(depths) >= 2, replies)
+                self.assertNotEqual(replies[-1], "bestmove 0000")
+            self.assertEqual(engine.quit(), 0)
+        finally:
+            if engine.process.poll() is None:
+                engine.process.kill()
+
+    def test_stop_infinite_with_threads(self):
+        engine = UCIProcess()
+        try:
+            engine.send("setoption name Threads value 2")
+            engine.send("position startpos")
+            engine.send("go infinite")
+            time.sleep(1)
+            start = time.monotonic()
+            engine.send("stop")
+            engine.expect("bestmove")
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertEqual(engine.quit(), 0)
+        finally:
+            if engine.process.poll() is None:
+                engine.process.kill()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+""" File: transposition.py
+This file contains the TranspositionTable class which stores the results of
+previously searched positions so that transposed positions do not need to be
+searched again.  SharedTranspositionTable keeps the same table in shared 
+memory so that search processes can use each other's results.
+"""
+import chess
+import chess.polyglot
+from multiprocessing import shared_memory
+
+
+# Bound types
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Approximate memory used by one table slot (list slot, entry tuple, key int
+# and move object) in bytes
+ENTRY_BYTES = 200
+
+# Bytes used by one shared table slot (checked key and packed data)
+SHARED_ENTRY_BYTES = 16
+SCORE_OFFSET = 1 << 31
+
+
+def position_key(board):
+    """ Returns the Zobrist hash of the given board
+    :param chess.Board board: The board to hash
+    :return: The 64-bit Polyglot Zobrist hash of the position
+    :rtype: int
+    """
+    return chess.polyglot.zobrist_hash(board)
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        """ Creates an empty table limited to roughly the given memory size
+        :param int size_mb: Memory cap of the table in megabytes
+        """
+        self.size = max(1, size_mb * 1024 * 1024 // ENTRY_BYTES)
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def clear(self):
+        """ Removes every entry from the table """
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def new_search(self):
+        """ Ages the table so entries from earlier searches are replaced
+        before entries from the current search
+        """
+        self.generation = (self.generation + 1) & 0xff
+
+    def probe(self, key):
+        """ Returns the entry stored for the given position
+        :param int key: The Zobrist hash of the position
+        :return: The entry (key, depth, score, bound, move, generation) or None
+            if the position is not stored
+        :rtype: tuple or None
+        """
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """ Stores a search result.  Each key maps to a single slot, an
+        existing entry is only replaced if it is from an earlier search or if
+        the new result was searched at least as deep.
+        :param int key: The Zobrist hash of the position
+        :param int depth: The depth the position was searched to
+        :param int score: The evaluation of the position
+        :param int bound: EXACT, LOWER or UPPER
+        :param chess.Move or None move: The best move found
+        """
+        index = key % self.size
+        entry = self.entries[index]
+        if (entry is None or entry[5] != self.generation or
+            depth >= entry[1]):
+            self.entries[index] = (key, depth, score, bound, move,
+                                   self.generation)
+
+
+def encode_move(move):
+    """ Packs a move into 16 bits, 0 is used for no move
+    :param chess.Move or None move: The move to pack
+    :return: The packed move
+    :rtype: int
+    """
+    if move is None:
+        return 0
+    return (move.from_square | move.to_square << 6 | 
+            (move.promotion or 0) << 12)
+
+
+def decode_move(packed):
+    """ Unpacks a move packed by encode_move
+    :param int packed: The packed move
+    :return: The move or None if no move was packed
+    :rtype: chess.Move or None
+    """
+    if packed == 0:
+        return None
+    return chess.Move(packed & 0x3f, packed >> 6 & 0x3f, 
+                      (packed >> 12) or None)
+
+
+class SharedTranspositionTable(TranspositionTable):
+    def __init__(self, size_mb=16, name=None):
+        """ Creates a table in shared memory or attaches to an existing one.
+        Each slot is two 64-bit words, the key xor the data and the data, so
+        that a slot torn by two processes writing at once fails the key check
+        instead of returning a mixed entry.  New shared memory is zero 
+        filled, which is an empty table.
+        :param int size_mb: Memory cap of the table in megabytes
+        :param str or None name: Name of the shared memory block to attach 
+            to, a new block is created when None
+        """
+        self.size = max(1, size_mb * 1024 * 1024 // SHARED_ENTRY_BYTES)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(
+                create=True, size=self.size * SHARED_ENTRY_BYTES)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self.slots = self.shm.buf.cast('Q')
+        self.generation = 0
+
+    def clear(self):
+        """ Removes every entry from the table """
+        self.shm.buf[:self.size * SHARED_ENTRY_BYTES] = bytes(
+            self.size * SHARED_ENTRY_BYTES)
+        self.generation = 0
+
+    def new_search(self):
+        """ Ages the table so entries from earlier searches are replaced
+        before entries from the current search
+        """
+        self.generation = (self.generation + 1) & 0x3f
+
+    def probe(self, key):
+        """ Returns the entry stored for the given position
+        :param int key: The Zobrist hash of the position
+        :return: The entry (key, depth, score, bound, move, generation) or None
+            if the position is not stored
+        :rtype: tuple or None
+        """
+        index = 2 * (key % self.size)
+        data = self.slots[index + 1]
+        if data == 0 or self.slots[index] ^ data != key:
+            return None
+        return (key, data >> 48 & 0xff, (data >> 16 & 0xffffffff) - 
+                SCORE_OFFSET, data >> 56 & 0x3, decode_move(data & 0xffff), 
+                data >> 58)
+
+    def store(self, key, depth, score, bound, move):
+        """ Stores a search result using the same replacement policy as
+        TranspositionTable
+        :param int key: The Zobrist hash of the position
+        :param int depth: The depth the position was searched to
+        :param int score: The evaluation of the position
+        :param int bound: EXACT, LOWER or UPPER
+        :param chess.Move or None move: The best move found
+        """
+        index = 2 * (key % self.size)
+        old = self.slots[index + 1]
+        if (old != 0 and old >> 58 == self.generation and 
+            depth < old >> 48 & 0xff):
+            return
+        data = (encode_move(move) | (score + SCORE_OFFSET) << 16 | 
+                min(depth, 0xff) << 48 | bound << 56 | self.generation << 58)
+        self.slots[index] = key ^ data
+        self.slots[index + 1] = data
+
+    def close(self):
+        """ Detaches from the shared memory and frees it if this table 
+        created it
+        """
+        self.slots.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
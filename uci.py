@@ -0,0 +1,260 @@
+""" File: uci.py
+This file contains the UCI engine entry point which lets chess GUIs,
+tournament managers and benchmark tools play AIGame without pygame.  It
+reads Universal Chess Interface commands from stdin and writes replies to
+stdout.  Searches run on a background thread so stop can interrupt them.
+
+Usage: python uci.py
+"""
+from ai_game import MATE_SCORE, AIGame
+import chess
+import sys
+import threading
+
+
+ENGINE_NAME = "bstuchel chess"
+ENGINE_AUTHOR = "bstuchel"
+
+# UCI options with their type, default, min and max
+OPTIONS = {
+    "Hash": ("spin", 16, 1, 4096),
+    "Threads": ("spin", 1, 1, 64),
+    "OwnBook": ("check", False, None, None)
+}
+
+# Time management
+MOVES_TO_GO = 30        # Moves the remaining time is shared by when unknown
+INCREMENT_SHARE = 0.8   # Share of the increment spent on each move
+MAX_TIME_SHARE = 0.5    # Most of the remaining time spent on one move
+MOVE_OVERHEAD = 0.05    # Seconds kept for communication with the GUI
+
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        """ Creates the engine with the default options
+        :param file output: Where replies are written
+        """
+        self.output = output
+        self._output_lock = threading.Lock()
+        self.options = {name: option[1] for name, option in OPTIONS.items()}
+        self.game = None
+        self.board = chess.Board()
+        self._thread = None
+        self._searcher = None
+        self._stopped = threading.Event()
+        self._new_game()
+
+    def _new_game(self):
+        """ Creates the search game with the current options """
+        if self.game is not None:
+            self.game.close()
+        self.game = AIGame(tt_size_mb=self.options["Hash"],
+                           workers=self.options["Threads"],
+                           opening_book=self.options["OwnBook"],
+                           time_limit=None, on_iteration=self._info)
+
+    def send(self, line):
+        """ Writes a reply line
+        :param str line: The reply
+        """
+        with self._output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self, commands=sys.stdin):
+        """ Handles commands until quit or the end of the input
+        :param file commands: Where commands are read from
+        """
+        for line in commands:
+            if not self.handle(line):
+                break
+        self.stop()
+        self.game.close()
+
+    def handle(self, line):
+        """ Handles one command
+        :param str line: The command
+        :return: False if the engine should quit
+        :rtype: bool
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "quit":
+            return False
+        elif command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            for name, (kind, default, low, high) in OPTIONS.items():
+                option = f"option name {name} type {kind} default "
+                if kind == "check":
+                    option += "true" if default else "false"
+                else:
+                    option += f"{default} min {low} max {high}"
+                self.send(option)
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.stop()
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.stop()
+            self.game.tt.clear()
+            self.board = chess.Board()
+        elif command == "position":
+            self.stop()
+            self.set_position(args)
+        elif command == "go":
+            self.stop()
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        return True
+
+    def set_option(self, args):
+        """ Handles setoption name <name> value <value>
+        :param list[str] args: The arguments of the command
+        """
+        if "name" not in args:
+            return
+        value_at = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:value_at])
+        value = " ".join(args[value_at + 1:])
+        if name not in OPTIONS:
+            self.send(f"info string unknown option {name}")
+            return
+        kind, _, low, high = OPTIONS[name]
+        if kind == "check":
+            self.options[name] = value.lower() == "true"
+        else:
+            try:
+                self.options[name] = min(max(int(value), low), high)
+            except ValueError:
+                self.send(f"info string bad value {value} for {name}")
+                return
+        self._new_game()
+
+    def set_position(self, args):
+        """ Handles position [startpos | fen <fen>] [moves <moves>...]
+        :param list[str] args: The arguments of the command
+        """
+        moves_at = args.index("moves") if "moves" in args else len(args)
+        try:
+            if args and args[0] == "fen":
+                board = chess.Board(" ".join(args[1:moves_at]))
+            else:
+                board = chess.Board()
+            for uci in args[moves_at + 1:]:
+                board.push_uci(uci)
+        except ValueError as error:
+            self.send(f"info string bad position: {error}")
+            return
+        self.board = board
+
+    def go(self, args):
+        """ Handles go with depth, movetime, wtime, btime, winc, binc,
+        movestogo, nodes and infinite, starting the search on a background
+        thread
+        :param list[str] args: The arguments of the command
+        """
+        limits = {}
+        infinite = False
+        i = 0
+        while i < len(args):
+            if args[i] == "infinite":
+                infinite = True
+            elif i + 1 < len(args):
+                try:
+                    limits[args[i]] = int(args[i + 1])
+                except ValueError:
+                    pass
+                i += 1
+            i += 1
+
+        self._stopped.clear()
+        self._searcher = self.game.fork(self.board)
+        self._thread = threading.Thread(
+            target=self._search, daemon=True,
+            args=(self._searcher, self.time_limit(limits),
+                  limits.get("nodes"), limits.get("depth"), infinite))
+        self._thread.start()
+
+    def time_limit(self, limits):
+        """ Returns the seconds to search for given the limits of a go
+        command
+        :param dict limits: The numeric arguments of the go command
+        :return: The time budget or None for no time limit
+        :rtype: float or None
+        """
+        if "movetime" in limits:
+            return max(limits["movetime"] / 1000 - MOVE_OVERHEAD, 0.01)
+        side = "w" if self.board.turn == chess.WHITE else "b"
+        if f"{side}time" not in limits:
+            return None
+        remaining = limits[f"{side}time"] / 1000
+        increment = limits.get(f"{side}inc", 0) / 1000
+        budget = (remaining / limits.get("movestogo", MOVES_TO_GO) +
+                  increment * INCREMENT_SHARE)
+        budget = min(budget, remaining * MAX_TIME_SHARE)
+        return max(budget - MOVE_OVERHEAD, 0.01)
+
+    def _search(self, game, time_limit, node_limit, depth, infinite):
+        """ Finds and sends the best move of a position.  Run on the search
+        thread.
+        :param AIGame game: The search game of the position
+        :param float or None time_limit: Seconds the search may take
+        :param int or None node_limit: Nodes the search may visit
+        :param int or None depth: Depth to stop deepening at
+        :param bool infinite: True to wait for stop before sending the move
+        """
+        board = game.board
+        move = None
+        if game.in_opening():
+            move = game.book.probe(board)
+            if move is not None and not board.is_legal(move):
+                move = None
+        if move is None and board.outcome() is None:
+            kwargs = {} if depth is None else {"max_depth": max(depth, 1)}
+            move = game.search(time_limit, node_limit, **kwargs).move
+            if move is None:
+                move = next(iter(board.legal_moves), None)
+        if infinite:
+            self._stopped.wait()
+        self.send(f"bestmove {move.uci() if move else '0000'}")
+
+    def _info(self, iteration):
+        """ Sends the info line of a completed iteration
+        :param Iteration iteration: The iteration
+        """
+        nodes = iteration.nodes + iteration.qnodes
+        elapsed = max(iteration.time, 1e-6)
+        score = iteration.score
+        if self._searcher.board.turn == chess.BLACK:
+            score = -score
+        if abs(score) >= MATE_SCORE:
+            moves = (len(iteration.pv) + 1) // 2
+            score_text = f"mate {moves if score > 0 else -moves}"
+        else:
+            score_text = f"cp {score}"
+        pv = " ".join(move.uci() for move in iteration.pv)
+        self.send(f"info depth {iteration.depth} score {score_text} "
+                  f"nodes {nodes} nps {int(nodes / elapsed)} "
+                  f"time {int(iteration.time * 1000)} pv {pv}")
+
+    def stop(self):
+        """ Stops the running search, which sends its best move, and waits
+        for it
+        """
+        if self._thread is None:
+            return
+        self._searcher.stop()
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        self._searcher = None
+
+
+if __name__ == "__main__":
+    UCIEngine().run()